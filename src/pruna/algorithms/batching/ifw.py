@@ -12,16 +12,38 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from functools import lru_cache
 from typing import Any, Dict
 
 import torch
-from ConfigSpace import Constant, OrdinalHyperparameter
+from ConfigSpace import CategoricalHyperparameter, Constant, OrdinalHyperparameter
 from transformers import AutomaticSpeechRecognitionPipeline, pipeline
+from transformers.models.auto.modeling_auto import (
+    MODEL_FOR_CTC_MAPPING_NAMES,
+    MODEL_FOR_SPEECH_SEQ_2_SEQ_MAPPING_NAMES,
+)
 from transformers.utils import is_flash_attn_2_available
 
 from pruna.algorithms.batching import PrunaBatcher
 from pruna.algorithms.compilation.c_translate import WhisperWrapper
 from pruna.config.smash_config import SmashConfigPrefixWrapper
+from pruna.logging.logger import pruna_logger
+
+# model types that are supported by the automatic-speech-recognition pipeline
+ASR_MODEL_TYPES = frozenset(MODEL_FOR_SPEECH_SEQ_2_SEQ_MAPPING_NAMES) | frozenset(MODEL_FOR_CTC_MAPPING_NAMES)
+
+
+@lru_cache(maxsize=1)
+def _is_flash_attn_2_available() -> bool:
+    """
+    Check once per process whether flash attention 2 is available.
+
+    Returns
+    -------
+    bool
+        True if flash attention 2 is available, False otherwise.
+    """
+    return is_flash_attn_2_available()
 
 
 class IFWBatcher(PrunaBatcher):
@@ -65,6 +87,15 @@ class IFWBatcher(PrunaBatcher):
                 meta=dict(desc="The batch size to use for inference. Higher is faster but needs more memory."),
             ),
             Constant(name="chunk_length", value=30),
+            CategoricalHyperparameter(
+                "attn_implementation",
+                choices=["sdpa", "flash_attention_2"],
+                default_value="sdpa",
+                meta=dict(
+                    desc="The attention implementation to use. SDPA already dispatches to flash attention kernels "
+                    "on supported hardware."
+                ),
+            ),
         ]
 
     def model_check_fn(self, model: Any) -> bool:
@@ -85,12 +116,9 @@ class IFWBatcher(PrunaBatcher):
             return True
         if isinstance(model, AutomaticSpeechRecognitionPipeline):
             return True
-        try:
-            # requirement is that the model is compatible with the asr pipeline
-            pipeline("automatic-speech-recognition", model=model)
-            return True
-        except Exception:
-            return False
+        # requirement is that the model is compatible with the asr pipeline
+        config = getattr(model, "config", None)
+        return getattr(config, "model_type", None) in ASR_MODEL_TYPES
 
     def _apply(self, model: Any, smash_config: SmashConfigPrefixWrapper) -> Any:
         """
@@ -115,6 +143,11 @@ class IFWBatcher(PrunaBatcher):
 
         torch_dtype = torch.float16 if smash_config["weight_bits"] == 16 else torch.float32
 
+        attn_implementation = smash_config["attn_implementation"]
+        if attn_implementation == "flash_attention_2" and not _is_flash_attn_2_available():
+            pruna_logger.warning("flash_attention_2 is not available, falling back to sdpa.")
+            attn_implementation = "sdpa"
+
         # ignore mypy warnings here because we ensure beforehand that processor is not None
         pipe = pipeline(
             "automatic-speech-recognition",
@@ -124,11 +157,7 @@ class IFWBatcher(PrunaBatcher):
             chunk_length_s=smash_config["chunk_length"],
             batch_size=smash_config["batch_size"],
             torch_dtype=torch_dtype,
-            model_kwargs=(
-                {"attn_implementation": "flash_attention_2"}
-                if is_flash_attn_2_available()
-                else {"attn_implementation": "sdpa"}
-            ),
+            model_kwargs={"attn_implementation": attn_implementation},
             device=smash_config["device"],
         )
         return pipe
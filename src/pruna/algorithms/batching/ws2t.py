@@ -222,6 +222,9 @@ class WhisperS2TWrapper:
         Any
             The attribute value.
         """
+        # private and dunder lookups (e.g. from hasattr checks or copy) are not forwarded to the wrapped model
+        if name.startswith("_"):
+            raise AttributeError(name)
         return getattr(self.whisper, name)
 
     def __call__(self, files: Union[str, List[str]], *args, **kwargs) -> str:
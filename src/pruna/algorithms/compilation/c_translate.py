@@ -12,11 +12,15 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
 import os
+import shutil
 import sys
+import tempfile
 from argparse import Namespace
 from typing import Any, Dict, List
 
+import numpy as np
 import torch
 import transformers
 from ConfigSpace import OrdinalHyperparameter
@@ -32,9 +36,14 @@ from transformers import (
 
 from pruna.algorithms.compilation import PrunaCompiler
 from pruna.config.smash_config import SmashConfigPrefixWrapper
+from pruna.config.smash_space import Boolean
 from pruna.engine.model_checks import is_causal_lm, is_translation_model
 from pruna.logging.logger import pruna_logger
 
+SHARED_MEMORY_DIR = "/dev/shm"
+# number of elements of every weight tensor that are hashed into the conversion key
+WEIGHT_SAMPLES_PER_TENSOR = 1024
+
 
 class CTranslateCompiler(PrunaCompiler):
     """
@@ -85,6 +94,25 @@ class CTranslateCompiler(PrunaCompiler):
                 default_value=16,
                 meta=dict(desc="Sets the number of bits to use for weight quantization."),
             ),
+            OrdinalHyperparameter(
+                "intra_threads",
+                sequence=[0, 1, 2, 4, 8, 16, 32],
+                default_value=0,
+                meta=dict(desc="Number of OpenMP threads per translator. 0 uses half of the available CPU cores."),
+            ),
+            OrdinalHyperparameter(
+                "inter_threads",
+                sequence=[1, 2, 4, 8],
+                default_value=1,
+                meta=dict(desc="Maximum number of batches processed in parallel."),
+            ),
+            Boolean(
+                "shared_memory",
+                meta=dict(
+                    desc="Whether to store the converted model in shared memory to speed up reloading it. "
+                    "The converted model stays in /dev/shm after the process exits and has to be removed manually."
+                ),
+            ),
         ]
 
     def model_check_fn(self, model: Any) -> bool:
@@ -150,51 +178,44 @@ class CTranslateCompiler(PrunaCompiler):
         elif isinstance(model, AutomaticSpeechRecognitionPipeline):
             model = model.model
 
-        # Create outfile directory
-        out_dir = os.path.join(smash_config["cache_dir"], "outputs")
-        if not os.path.exists(out_dir):
-            os.mkdir(out_dir)
-
-        model.save_pretrained(out_dir)
-        # we can ignore mypy warnings here because we ensure beforehand that processor and tokenizer are not None
-        if self.processor_required:
-            smash_config.processor.save_pretrained(out_dir)  # type: ignore[attr-defined]
-        elif self.tokenizer_required:
-            smash_config.tokenizer.save_pretrained(out_dir)  # type: ignore[attr-defined]
-
-        temp_dir = os.path.join(out_dir, "temp")
-        os.mkdir(temp_dir)
-        args = Namespace(
-            output_dir=temp_dir,
-            vocab_mapping=None,
-            quantization="int8" if smash_config["weight_bits"] == 8 else "float16",
-            force=True,
-        )
-
-        # For BART models due to weird hardcoded function in c_translate2
-        def load_model(self: Any, model_class: Any, model_name_or_path: str, **kwargs: Any) -> None:
-            model = model_class.from_pretrained(model_name_or_path, **kwargs)
-            if not hasattr(model.config, "normalize_before"):
-                model.config.normalize_before = False
-            return model
-
-        setattr(imported_modules["TransformersConverter"], "load_model", load_model)
-
-        # Convert the model to the c_translate2 format
-        converter = imported_modules["TransformersConverter"](
-            out_dir,
-            load_as_float16=True,
+        # Reuse a previous conversion of the same model and configuration if there is one
+        key = _conversion_key(model, self.task_name, smash_config["weight_bits"], smash_config["device"])
+        if smash_config["shared_memory"] and os.path.isdir(SHARED_MEMORY_DIR):
+            # the tmpfs directory outlives the process, so other processes can load the weights from memory,
+            # it is not removed automatically and takes up RAM until it is deleted or the machine restarts
+            temp_dir = os.path.join(SHARED_MEMORY_DIR, f"ct2_{key}")
+        else:
+            temp_dir = os.path.join(smash_config["cache_dir"], "ct2_cache", key)
+        if not os.path.isdir(temp_dir):
+            # convert into a private staging directory and move it into place at once,
+            # so a half-written or concurrently written conversion is never picked up
+            os.makedirs(os.path.dirname(temp_dir), exist_ok=True)
+            staging_dir = tempfile.mkdtemp(prefix=f".{os.path.basename(temp_dir)}_", dir=os.path.dirname(temp_dir))
+            try:
+                self._convert(model, smash_config, staging_dir, imported_modules)
+                os.replace(staging_dir, temp_dir)
+            except OSError:
+                # another process moved its conversion into place first, use that one
+                if not os.path.isdir(temp_dir):
+                    raise
+            finally:
+                shutil.rmtree(staging_dir, ignore_errors=True)
+
+        # pre-pack the weights at load time instead of on every GEMM call
+        os.environ.setdefault("CT2_USE_EXPERIMENTAL_PACKED_GEMM", "1")
+        runtime_kwargs = dict(
+            device=smash_config["device"],
+            intra_threads=smash_config["intra_threads"] or max(1, (os.cpu_count() or 2) // 2),
+            inter_threads=smash_config["inter_threads"],
         )
-
-        converter.convert_from_args(args)
         if self.task_name == "translate":
-            optimized_model = imported_modules["Translator"](temp_dir, device=smash_config["device"])
+            optimized_model = imported_modules["Translator"](temp_dir, **runtime_kwargs)
             optimized_model = TranslatorWrapper(optimized_model, temp_dir, smash_config.tokenizer)
         elif self.task_name == "generate":
-            optimized_model = imported_modules["Generator"](temp_dir, device=smash_config["device"])
+            optimized_model = imported_modules["Generator"](temp_dir, **runtime_kwargs)
             optimized_model = GeneratorWrapper(optimized_model, temp_dir, smash_config.tokenizer)
         elif self.task_name == "whisper":
-            optimized_model = imported_modules["Whisper"](temp_dir, device=smash_config["device"])
+            optimized_model = imported_modules["Whisper"](temp_dir, **runtime_kwargs)
             optimized_model = WhisperWrapper(optimized_model, temp_dir, smash_config.processor)
             optimized_model.config = model.config
         else:
@@ -202,6 +223,66 @@ class CTranslateCompiler(PrunaCompiler):
 
         return optimized_model
 
+    def _convert(
+        self, model: Any, smash_config: SmashConfigPrefixWrapper, temp_dir: str, imported_modules: Dict[str, Any]
+    ) -> None:
+        """
+        Convert the model to the c_translate2 format.
+
+        Parameters
+        ----------
+        model : Any
+            The model to convert.
+        smash_config : SmashConfigPrefixWrapper
+            The configuration for the compilation.
+        temp_dir : str
+            The directory to write the converted model to.
+        imported_modules : Dict[str, Any]
+            The imported algorithm packages.
+        """
+        # Create a fresh staging directory for the transformers checkpoint, leftovers of previous runs do not collide
+        out_dir = tempfile.mkdtemp(prefix="ct2_", dir=smash_config["cache_dir"])
+        try:
+            model.save_pretrained(out_dir)
+            # we can ignore mypy warnings here because we ensure beforehand that processor and tokenizer are not None
+            if self.processor_required:
+                smash_config.processor.save_pretrained(out_dir)  # type: ignore[attr-defined]
+            elif self.tokenizer_required:
+                smash_config.tokenizer.save_pretrained(out_dir)  # type: ignore[attr-defined]
+
+            os.makedirs(temp_dir, exist_ok=True)
+            if smash_config["weight_bits"] == 8:
+                # on GPU, keep int8 weights but compute the remaining operations in float16 to preserve accuracy
+                quantization = "int8_float16" if str(smash_config["device"]).startswith("cuda") else "int8"
+            else:
+                quantization = "float16"
+            args = Namespace(
+                output_dir=temp_dir,
+                vocab_mapping=None,
+                quantization=quantization,
+                force=True,
+            )
+
+            # For BART models due to weird hardcoded function in c_translate2
+            def load_model(self: Any, model_class: Any, model_name_or_path: str, **kwargs: Any) -> None:
+                model = model_class.from_pretrained(model_name_or_path, **kwargs)
+                if not hasattr(model.config, "normalize_before"):
+                    model.config.normalize_before = False
+                return model
+
+            setattr(imported_modules["TransformersConverter"], "load_model", load_model)
+
+            # Convert the model to the c_translate2 format
+            converter = imported_modules["TransformersConverter"](
+                out_dir,
+                load_as_float16=True,
+            )
+
+            converter.convert_from_args(args)
+        finally:
+            # the intermediate checkpoint is a full copy of the model, only the converted model is kept
+            shutil.rmtree(out_dir, ignore_errors=True)
+
     def import_algorithm_packages(self) -> Dict[str, Any]:
         """
         Import the algorithm packages.
@@ -306,6 +387,93 @@ class CWhisperCompiler(CTranslateCompiler):
         super().__init__(task_name="whisper")
 
 
+def _conversion_key(model: Any, task_name: str, weight_bits: Any, device: Any) -> str:
+    """
+    Compute a key identifying the c_translate2 conversion of a model.
+
+    Parameters
+    ----------
+    model : Any
+        The model to convert.
+    task_name : str
+        The task name of the compiler.
+    weight_bits : Any
+        The weight bits used for the conversion.
+    device : Any
+        The device the converted model is run on, which determines the quantization type.
+
+    Returns
+    -------
+    str
+        The key of the conversion.
+    """
+    key = hashlib.sha256()
+    key.update(model.config.to_json_string(use_diff=False).encode())
+    # fine-tunes of a base model share its config, so the weights have to be part of the key, a strided sample of
+    # every tensor is taken on its device and copied to the host at once instead of hashing all weights
+    samples = []
+    for name, tensor in model.state_dict().items():
+        key.update(f"{name}-{tensor.dtype}-{tuple(tensor.shape)}".encode())
+        flat = tensor.detach().reshape(-1)
+        sample = flat[:: max(1, flat.numel() // WEIGHT_SAMPLES_PER_TENSOR)][:WEIGHT_SAMPLES_PER_TENSOR]
+        samples.append(sample.contiguous().view(torch.uint8).to(samples[0].device if samples else sample.device))
+    if samples:
+        key.update(torch.cat(samples).cpu().numpy())
+    key.update(f"{task_name}-{weight_bits}-{device}".encode())
+    return key.hexdigest()[:16]
+
+
+def _build_id_to_token(tokenizer: AutoTokenizer) -> np.ndarray:
+    """
+    Build a lookup table mapping every token id of the tokenizer to its token.
+
+    Parameters
+    ----------
+    tokenizer : AutoTokenizer
+        The tokenizer to build the lookup table for.
+
+    Returns
+    -------
+    np.ndarray
+        An object array where the entry at index i is the token with id i.
+    """
+    return np.array(tokenizer.convert_ids_to_tokens(list(range(len(tokenizer)))), dtype=object)
+
+
+def _ids_to_tokens(id_to_token: np.ndarray, ids: Any) -> List[List[str]]:
+    """
+    Convert a batch of token ids to tokens with a single lookup instead of one tokenizer call per sequence.
+
+    Parameters
+    ----------
+    id_to_token : np.ndarray
+        The lookup table built with `_build_id_to_token`.
+    ids : Any
+        The batch of token ids, either as a tensor or as a nested list.
+
+    Returns
+    -------
+    List[List[str]]
+        The tokens for every sequence in the batch.
+
+    Raises
+    ------
+    ValueError
+        If a token id is outside of the vocabulary.
+    """
+    if isinstance(ids, torch.Tensor):
+        ids = ids.cpu().numpy()
+    try:
+        batch = np.asarray(ids, dtype=np.int64)
+    except ValueError:
+        # unpadded sequences of different lengths do not form an array, they are looked up one by one
+        return [_ids_to_tokens(id_to_token, [sequence])[0] for sequence in ids]
+    # negative ids would silently index from the end of the vocabulary
+    if batch.size > 0 and (batch.min() < 0 or batch.max() >= len(id_to_token)):
+        raise ValueError(f"Token ids must be in the range [0, {len(id_to_token)}), got {batch.min()} to {batch.max()}.")
+    return id_to_token[batch].tolist()
+
+
 class GeneratorWrapper:
     """
     A wrapper for Hugging Face's Generator models.
@@ -323,6 +491,7 @@ class GeneratorWrapper:
     def __init__(self, generator: AutoModelForCausalLM, output_dir: str, tokenizer: AutoTokenizer) -> None:
         self.generator = generator
         self.output_dir = output_dir
+        self._id_to_token = _build_id_to_token(tokenizer)
         self.task = "generation"
         self.tokenizer = tokenizer
 
@@ -340,6 +509,9 @@ class GeneratorWrapper:
         Any
             The attribute value.
         """
+        # private and dunder lookups (e.g. from hasattr checks or copy) are not forwarded to the wrapped model
+        if name.startswith("_"):
+            raise AttributeError(name)
         return getattr(self.generator, name)
 
     def __call__(
@@ -373,7 +545,7 @@ class GeneratorWrapper:
             x_tensor = x["input_ids"]
         else:
             x_tensor = x
-        token_list = [self.tokenizer.convert_ids_to_tokens(x_tensor[i]) for i in range(len(x_tensor))]
+        token_list = _ids_to_tokens(self._id_to_token, x_tensor)
         return self.generator.generate_batch(token_list, min_length=min_length, max_length=max_length, *args, **kwargs)
 
 
@@ -394,6 +566,7 @@ class TranslatorWrapper:
     def __init__(self, translator: AutoModelForSeq2SeqLM, output_dir: str, tokenizer: AutoTokenizer) -> None:
         self.translator = translator
         self.output_dir = output_dir
+        self._id_to_token = _build_id_to_token(tokenizer)
         self.task = "translation"
         self.tokenizer = tokenizer
 
@@ -411,6 +584,9 @@ class TranslatorWrapper:
         Any
             The attribute value.
         """
+        # private and dunder lookups (e.g. from hasattr checks or copy) are not forwarded to the wrapped model
+        if name.startswith("_"):
+            raise AttributeError(name)
         return getattr(self.translator, name)
 
     def __call__(
@@ -448,7 +624,7 @@ class TranslatorWrapper:
             x_tensor = x["input_ids"]
         else:
             x_tensor = x
-        token_list = [self.tokenizer.convert_ids_to_tokens(x_tensor[i]) for i in range(len(x_tensor))]
+        token_list = _ids_to_tokens(self._id_to_token, x_tensor)
         return self.translator.translate_batch(
             token_list, min_decoding_length=min_decoding_length, max_decoding_length=max_decoding_length, *args, **kwargs
         )
@@ -475,6 +651,18 @@ class WhisperWrapper:
         self.processor = processor
         self.language = None
         self.prompt = None
+        # the special tokens of the prompt are static, only the language token depends on the input
+        self._sot_id, self._transcribe_id, self._notimestamps_id = processor.tokenizer.convert_tokens_to_ids(
+            [
+                "<|startoftranscript|>",
+                "<|transcribe|>",
+                "<|notimestamps|>",  # Remove this token to generate timestamps.
+            ]
+        )
+        self._lang_id_cache: Dict[str, int] = {}
+        self._host_buffer: torch.Tensor | None = None
+        # prompt batches are reused across calls, keyed by batch size
+        self._prompt_batches: Dict[int, List[List[int]]] = {}
 
     def __getattr__(self, name: str) -> Any:
         """
@@ -490,9 +678,58 @@ class WhisperWrapper:
         Any
             The attribute value.
         """
+        # private and dunder lookups (e.g. from hasattr checks or copy) are not forwarded to the wrapped model
+        if name.startswith("_"):
+            raise AttributeError(name)
         return getattr(self.whisper, name)
 
-    def __call__(self, features: torch.Tensor, prompt: List[str] = [], *args, **kwargs) -> torch.Tensor:
+    def _to_numpy(self, features: torch.Tensor) -> Any:
+        """
+        Convert the features to a numpy array, reusing a pinned host buffer for features on the GPU.
+
+        Parameters
+        ----------
+        features : torch.Tensor
+            The input audio features.
+
+        Returns
+        -------
+        Any
+            The features as a numpy array.
+        """
+        features = features.detach()
+        if not features.is_cuda:
+            return features.contiguous().numpy()
+        # chunks usually share the same shape, so the pinned buffer can be reused across calls
+        if (
+            self._host_buffer is None
+            or self._host_buffer.shape != features.shape
+            or self._host_buffer.dtype != features.dtype
+        ):
+            self._host_buffer = torch.empty(features.shape, dtype=features.dtype, device="cpu", pin_memory=True)
+        self._host_buffer.copy_(features, non_blocking=True)
+        torch.cuda.current_stream(features.device).synchronize()
+        return self._host_buffer.numpy()
+
+    def _get_prompt_batch(self, batch_size: int) -> List[List[int]]:
+        """
+        Get the prompt repeated for every sample of the batch, building it only once per batch size.
+
+        Parameters
+        ----------
+        batch_size : int
+            The number of samples in the batch.
+
+        Returns
+        -------
+        List[List[int]]
+            The prompt for every sample of the batch.
+        """
+        if batch_size not in self._prompt_batches:
+            self._prompt_batches[batch_size] = [self.prompt] * batch_size
+        return self._prompt_batches[batch_size]
+
+    def __call__(self, features: torch.Tensor, *args, **kwargs) -> torch.Tensor:
         """
         Transcribe audio features using the Whisper model.
 
@@ -503,17 +740,19 @@ class WhisperWrapper:
         ----------
         features : torch.Tensor
             The input audio features to transcribe.
-        prompt : List[str], optional
-            A list of prompt tokens to guide the transcription. Defaults to an empty list.
         *args : tuple
             Variable length argument list.
         **kwargs : dict
-            Arbitrary keyword arguments. Can include 'language' to specify the audio language.
+            Arbitrary keyword arguments. Can include 'language' to specify the audio language, 'prompt' with a list
+            of prompt token ids to guide the transcription, 'use_batch' to
+            disable batched decoding and decode the samples one by one, and 'max_batch_size' which is forwarded to
+            the CTranslate2 generator to split large batches.
 
         Returns:
         -------
         torch.Tensor
-            The generated sequence IDs representing the transcription.
+            The generated sequence IDs representing the transcription. For batched features, a list with the
+            sequence IDs of every sample is returned.
         """
         try:
             from ctranslate2 import StorageView
@@ -523,24 +762,41 @@ class WhisperWrapper:
                 " --extra-index-url https://prunaai.pythonanywhere.com/`."
             )
             raise
-        features = StorageView.from_array(features.cpu().numpy())
-        # Detect the language.
-        if kwargs.get("language"):
-            language = kwargs["language"]
-        elif self.language is None:
+        use_batch = kwargs.pop("use_batch", True)
+        array = self._to_numpy(features)
+        batch_size = array.shape[0]
+        features = StorageView.from_array(array)
+        # Detect the language only once, subsequent chunks reuse the detected language.
+        # language and prompt are consumed here and not forwarded to the CTranslate2 generator
+        language = kwargs.pop("language", None)
+        prompt = kwargs.pop("prompt", None)
+        if not language and self.language is None:
             results = self.whisper.detect_language(features)
             language, _ = results[0][0]
             self.language = language
-        if kwargs.get("prompt"):
-            self.prompt = kwargs["prompt"]
+        elif not language:
+            language = self.language
+        if prompt:
+            if prompt != self.prompt:
+                self._prompt_batches.clear()
+            self.prompt = prompt
         elif self.prompt is None:
-            self.prompt = self.processor.tokenizer.convert_tokens_to_ids(
-                [
-                    "<|startoftranscript|>",
-                    language,
-                    "<|transcribe|>",
-                    "<|notimestamps|>",  # Remove this token to generate timestamps.
-                ]
-            )
-
-        return self.whisper.generate(features, [self.prompt], *args, **kwargs)[0].sequences_ids[0]
+            if language not in self._lang_id_cache:
+                self._lang_id_cache[language] = self.processor.tokenizer.convert_tokens_to_ids(language)
+            self.prompt = [self._sot_id, self._lang_id_cache[language], self._transcribe_id, self._notimestamps_id]
+            self._prompt_batches.clear()
+
+        single_prompt = self._get_prompt_batch(1)
+        if batch_size == 1:
+            return self.whisper.generate(features, single_prompt, *args, **kwargs)[0].sequences_ids[0]
+
+        if use_batch:
+            # a single generate call lets CTranslate2 decode all samples of the batch at once
+            results = self.whisper.generate(features, self._get_prompt_batch(batch_size), *args, **kwargs)
+        else:
+            # batched generation is not always faster for Whisper, hence the option to decode sample by sample
+            results = [
+                self.whisper.generate(StorageView.from_array(array[i : i + 1]), single_prompt, *args, **kwargs)[0]
+                for i in range(batch_size)
+            ]
+        return [result.sequences_ids[0] for result in results]
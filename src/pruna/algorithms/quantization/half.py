@@ -12,21 +12,25 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 import torch
+from ConfigSpace import OrdinalHyperparameter
+from torch.utils._pytree import tree_map
 
 from pruna.algorithms.quantization import PrunaQuantizer
 from pruna.config.smash_config import SmashConfigPrefixWrapper
+from pruna.config.smash_space import Boolean
 from pruna.engine.save import SAVE_FUNCTIONS
+from pruna.logging.logger import pruna_logger
 
 
 class HalfQuantizer(PrunaQuantizer):
     """
     Implement half precision quantization using torch.
 
-    Converting model parameters to half precision (FP16) reduces memory usage and can accelerate computations on GPUs
-    that support it.
+    Converting model parameters to half precision (FP16 or BF16) reduces memory usage and can accelerate computations
+    on GPUs that support it.
     """
 
     algorithm_name = "half"
@@ -61,7 +65,21 @@ class HalfQuantizer(PrunaQuantizer):
         list
             The hyperparameters.
         """
-        return []
+        return [
+            OrdinalHyperparameter(
+                "dtype",
+                sequence=["fp16", "bf16"],
+                default_value="fp16",
+                meta=dict(desc="The half precision data type. BF16 avoids FP16 overflows on Ampere and newer GPUs."),
+            ),
+            Boolean(
+                "compile",
+                meta=dict(
+                    desc="Whether to compile the half precision forward pass with torch.compile. On CUDA, outputs "
+                    "are overwritten by the next call and have to be cloned to keep them."
+                ),
+            ),
+        ]
 
     def model_check_fn(self, model: Any) -> bool:
         """
@@ -95,16 +113,47 @@ class HalfQuantizer(PrunaQuantizer):
         Any
             The quantized model.
         """
-        model.half()
-        for param in model.parameters():
-            param.requires_grad = False
+        target_dtype = torch.float16
+        if smash_config["dtype"] == "bf16":
+            if str(smash_config["device"]).startswith("cuda") and not torch.cuda.is_bf16_supported():
+                pruna_logger.warning("bf16 is not supported on this device, falling back to fp16.")
+            else:
+                target_dtype = torch.bfloat16
 
-        original_forward = model.forward
+        model.to(target_dtype)
+        model.requires_grad_(False)
+        model.eval()
 
+        original_forward = model.forward
+        if smash_config["compile"]:
+            original_forward = _compile_with_fallback(original_forward)
+
+        # convolutional models run their half precision convolutions on tensor cores in channels_last,
+        # the weights are converted once so cuDNN does not convert the layout on every call
+        channels_last = any(isinstance(module, torch.nn.Conv2d) for module in model.modules())
+        if channels_last:
+            model.to(memory_format=torch.channels_last)
+
+        def _cast(x: Any) -> Any:
+            if not isinstance(x, torch.Tensor) or not x.is_floating_point():
+                return x
+            # tensors that already have the target dtype are passed through to avoid a no-op copy kernel
+            return x if x.dtype is target_dtype else x.to(target_dtype)
+
+        def _cast_input(x: Any) -> Any:
+            # only top-level image inputs are moved to channels_last, nested 4D tensors such as attention masks
+            # keep their layout, to() returns the input itself if it already has the dtype and layout
+            if channels_last and isinstance(x, torch.Tensor) and x.dim() == 4 and x.is_floating_point():
+                return x.to(dtype=target_dtype, memory_format=torch.channels_last)
+            return tree_map(_cast, x)
+
+        # the half precision model is inference only, so autograd bookkeeping can be skipped entirely
+        @torch.inference_mode()
         def new_forward(*args: Any, **kwargs: Any) -> Any:
-            args = tuple(arg.half() if hasattr(arg, "half") else arg for arg in args)
-            kwargs = {k: v.half() if hasattr(v, "half") else v for k, v in kwargs.items()}
-            return original_forward(*args, **kwargs)
+            # fast path for the common single input call, e.g. forward(input_features)
+            if len(args) == 1 and not kwargs and isinstance(args[0], torch.Tensor):
+                return original_forward(_cast_input(args[0]))
+            return original_forward(*[_cast_input(arg) for arg in args], **tree_map(_cast, kwargs))
 
         model.forward = new_forward
 
@@ -120,3 +169,39 @@ class HalfQuantizer(PrunaQuantizer):
             The algorithm packages.
         """
         return dict()
+
+
+def _compile_with_fallback(forward: Callable) -> Callable:
+    """
+    Compile a forward pass with torch.compile and fall back to eager execution if the first call fails to compile.
+
+    torch.compile only compiles on the first call, so compilation errors surface there and not when wrapping.
+    The reduce-overhead mode replays CUDA graphs, which reuse their output buffers: the outputs of a call are
+    overwritten by the next call and have to be cloned if they are kept around.
+
+    Parameters
+    ----------
+    forward : Callable
+        The forward pass to compile.
+
+    Returns
+    -------
+    Callable
+        The compiled forward pass.
+    """
+    # reduce-overhead uses CUDA graphs to remove the per-kernel launch overhead of small batches
+    compiled_forward = torch.compile(forward, mode="reduce-overhead", fullgraph=False)
+    first_call = True
+
+    def forward_with_fallback(*args: Any, **kwargs: Any) -> Any:
+        nonlocal compiled_forward, first_call
+        if first_call:
+            first_call = False
+            try:
+                return compiled_forward(*args, **kwargs)
+            except Exception as e:
+                pruna_logger.warning(f"Could not compile the half precision forward pass, running it eagerly: {e}")
+                compiled_forward = forward
+        return compiled_forward(*args, **kwargs)
+
+    return forward_with_fallback
@@ -12,11 +12,13 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-import shutil
+import importlib.util
 import tempfile
+from functools import lru_cache
 from typing import Any, Dict
 
-from ConfigSpace import Constant, OrdinalHyperparameter
+import torch
+from ConfigSpace import CategoricalHyperparameter, OrdinalHyperparameter
 from transformers import AutoModelForCausalLM, HqqConfig
 
 from pruna.algorithms.quantization import PrunaQuantizer
@@ -67,7 +69,16 @@ class HQQQuantizer(PrunaQuantizer):
                 default_value=64,
                 meta=dict(desc="Group size for quantization."),
             ),
-            Constant("backend", value="torchao_int4"),
+            CategoricalHyperparameter(
+                "backend",
+                choices=["torchao_int4", "gemlite", "bitblas", "torchao_hqq_fused"],
+                default_value="gemlite" if "gemlite" in _available_backends() else "torchao_int4",
+                meta=dict(
+                    desc="Inference backend for 4-bit weights. torchao_int4 is fastest for single-sample decoding, "
+                    "gemlite and bitblas keep up at larger batch sizes. torchao_hqq_fused fuses dequantization "
+                    "and matmul in a single triton kernel for compute-bound workloads."
+                ),
+            ),
         ]
 
     def model_check_fn(self, model: Any) -> bool:
@@ -107,37 +118,53 @@ class HQQQuantizer(PrunaQuantizer):
         weight_quantization_bits = smash_config["weight_bits"]
         group_size = smash_config["group_size"]
 
-        quant_config_hqq = imported_modules["BaseQuantizeConfig"](nbits=weight_quantization_bits, group_size=group_size)
-        quant_config_hf = imported_modules["HqqConfig"](nbits=weight_quantization_bits, group_size=group_size)
-
-        try:  # Try to quantize the model using HF specific HQQ quantization which supports specific layers
-            # Create a temporary directory in a specific location
-            base_temp_dir = smash_config["cache_dir"]
-            temp_dir = tempfile.mkdtemp(dir=base_temp_dir)
-            model.save_pretrained(temp_dir)
+        # the fused triton kernel requires the weights to be grouped along the input features
+        axis_kwargs = dict(axis=1) if smash_config["backend"] == "torchao_hqq_fused" else dict()
+        quant_config_hqq = imported_modules["BaseQuantizeConfig"](
+            nbits=weight_quantization_bits, group_size=group_size, **axis_kwargs
+        )
+        quant_config_hf = imported_modules["HqqConfig"](
+            nbits=weight_quantization_bits, group_size=group_size, **axis_kwargs
+        )
 
-            smashed_model = AutoModelForCausalLM.from_pretrained(
-                temp_dir,
-                quantization_config=quant_config_hf,
-                trust_remote_code=True,
-            )
-            try:
-                smashed_model = smashed_model.to(smash_config["device"])
-            except Exception as e:
-                pruna_logger.error(f"Error casting model to device: {e}")
-
-            # Delete the temporary directory and its contents
-            shutil.rmtree(temp_dir)
-        except Exception as e:  # Default to generic HQQ quantization if it fails
-            pruna_logger.error(f"Error: {e}")
+        if _supports_in_memory_quantization(model):
+            # Quantize the in-memory model directly, HQQ is data-free and does not need a save and reload.
+            # This replaces the layers of the model in place, so there is no fallback once it has started.
             smashed_model = imported_modules["AutoHQQHFModel"].quantize_model(
                 model, quant_config=quant_config_hqq, device=smash_config["device"]
             )
+        else:  # Use the HF specific HQQ quantization which supports other layouts, it leaves the model untouched
+            # Create a temporary directory in a specific location, it is removed even if loading fails
+            with tempfile.TemporaryDirectory(dir=smash_config["cache_dir"]) as temp_dir:
+                model.save_pretrained(temp_dir)
+
+                # the checkpoint is local, only trust remote code if the model actually ships custom modeling code
+                load_kwargs = dict(
+                    quantization_config=quant_config_hf,
+                    trust_remote_code=getattr(model.config, "auto_map", None) is not None,
+                    local_files_only=True,
+                )
+                # load straight onto the target device, the weights are quantized as they arrive
+                try:
+                    smashed_model = AutoModelForCausalLM.from_pretrained(
+                        temp_dir, device_map={"": smash_config["device"]}, **load_kwargs
+                    )
+                except torch.cuda.OutOfMemoryError:
+                    # do not silently keep the model on cpu, offload the layers that do not fit instead
+                    pruna_logger.warning("Quantized model does not fit on the device, retrying with device_map='auto'.")
+                    torch.cuda.empty_cache()
+                    smashed_model = AutoModelForCausalLM.from_pretrained(temp_dir, device_map="auto", **load_kwargs)
 
         # Prepare the model for fast inference
+        backend = smash_config["backend"]
+        if backend not in imported_modules["available_backends"]:
+            pruna_logger.warning(f"The {backend} backend is not installed, falling back to torchao_int4.")
+            backend = "torchao_int4"
         try:
-            if weight_quantization_bits == 4:
-                imported_modules["prepare_for_inference"](model, backend=smash_config["backend"])
+            if weight_quantization_bits == 4 and backend == "torchao_hqq_fused":
+                _patch_fused_hqq_linear(smashed_model, imported_modules["HQQLinear"])
+            elif weight_quantization_bits == 4:
+                imported_modules["prepare_for_inference"](smashed_model, backend=backend)
         except Exception as e:
             pruna_logger.error(f"Error: {e}")
             pass
@@ -153,21 +180,127 @@ class HQQQuantizer(PrunaQuantizer):
         Dict[str, Any]
             The algorithm packages.
         """
-        try:
-            with SuppressOutput():
-                from hqq.core.quantize import BaseQuantizeConfig
-                from hqq.models.hf.base import AutoHQQHFModel
-                from hqq.utils.patching import prepare_for_inference
-        except ImportError:
-            pruna_logger.error(
-                "You are trying to use the HQQ quantizer, but hqq is not installed. "
-                "This is likely because you did not install hqq; try pip install hqq."
-            )
-            raise
+        # the imports and backend checks are resolved once per process, hqq's import output suppression is not free
+        return dict(_import_hqq_packages())
 
-        return dict(
-            BaseQuantizeConfig=BaseQuantizeConfig,
-            AutoHQQHFModel=AutoHQQHFModel,
-            prepare_for_inference=prepare_for_inference,
-            HqqConfig=HqqConfig,
+
+@lru_cache(maxsize=1)
+def _import_hqq_packages() -> Dict[str, Any]:
+    """
+    Import the hqq packages and check which inference backends are available.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The algorithm packages.
+    """
+    try:
+        with SuppressOutput():
+            from hqq.core.quantize import BaseQuantizeConfig, HQQLinear
+            from hqq.models.hf.base import AutoHQQHFModel
+            from hqq.utils.patching import prepare_for_inference
+    except ImportError:
+        pruna_logger.error(
+            "You are trying to use the HQQ quantizer, but hqq is not installed. "
+            "This is likely because you did not install hqq; try pip install hqq."
         )
+        raise
+
+    return dict(
+        BaseQuantizeConfig=BaseQuantizeConfig,
+        AutoHQQHFModel=AutoHQQHFModel,
+        prepare_for_inference=prepare_for_inference,
+        HqqConfig=HqqConfig,
+        HQQLinear=HQQLinear,
+        available_backends=_available_backends(),
+    )
+
+
+@lru_cache(maxsize=1)
+def _available_backends() -> tuple:
+    """
+    Check which 4-bit inference backends are installed, without importing them.
+
+    Returns
+    -------
+    tuple
+        The names of the available backends.
+    """
+    # the optional kernel backends are only checked for availability, hqq imports them itself
+    available_backends = ["torchao_int4"]
+    for backend in ["gemlite", "bitblas"]:
+        if importlib.util.find_spec(backend) is not None:
+            available_backends.append(backend)
+    if importlib.util.find_spec("torchao") is not None:
+        available_backends.append("torchao_hqq_fused")
+    return tuple(available_backends)
+
+
+def _supports_in_memory_quantization(model: Any) -> bool:
+    """
+    Check if AutoHQQHFModel can quantize the model in place.
+
+    AutoHQQHFModel maps its devices over the decoder blocks of HF models, stored under ``model.layers``.
+
+    Parameters
+    ----------
+    model : Any
+        The model to check.
+
+    Returns
+    -------
+    bool
+        True if the model has the decoder block layout AutoHQQHFModel expects, False otherwise.
+    """
+    core_model = model.model if hasattr(model, "model") else model
+    return isinstance(getattr(core_model, "layers", None), torch.nn.ModuleList)
+
+
+def _patch_fused_hqq_linear(model: Any, hqq_linear_class: Any) -> None:
+    """
+    Replace the forward of 4-bit HQQ linear layers with the fused dequantize and matmul triton kernel of torchao.
+
+    Parameters
+    ----------
+    model : Any
+        The HQQ quantized model, quantized with groups along the input features (axis=1).
+    hqq_linear_class : Any
+        The HQQLinear class of the hqq package.
+    """
+    from torchao.prototype.hqq import pack_2xint4, triton_mixed_mm
+
+    for module in model.modules():
+        if not isinstance(module, hqq_linear_class):
+            continue
+        meta = module.meta
+        out_features, in_features = meta["shape"]
+        group_size = meta["group_size"]
+        # the kernel expects int4 values packed two per byte along the input features
+        weight = module.unpack(dtype=torch.uint8).reshape(out_features, in_features)
+        packed_weight = pack_2xint4(weight.T)
+        scales = meta["scale"].reshape(out_features, -1).T.contiguous()
+        zeros = meta["zero"].reshape(out_features, -1).T.contiguous()
+
+        def fused_forward(
+            x: torch.Tensor,
+            module: Any = module,
+            packed_weight: torch.Tensor = packed_weight,
+            scales: torch.Tensor = scales,
+            zeros: torch.Tensor = zeros,
+            group_size: int = group_size,
+            out_features: int = out_features,
+        ) -> torch.Tensor:
+            out = triton_mixed_mm(
+                x.reshape(-1, x.shape[-1]),
+                packed_weight,
+                scales,
+                zeros,
+                transposed=False,
+                group_size=group_size,
+                fp8_fast_accum=False,
+            ).reshape(*x.shape[:-1], out_features)
+            if module.bias is not None:
+                out += module.bias
+            return out
+
+        module.forward = fused_forward
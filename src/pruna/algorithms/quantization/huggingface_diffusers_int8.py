@@ -12,12 +12,16 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import json
+import os
 import tempfile
-from typing import Any, Dict
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from functools import lru_cache
+from typing import Any, Dict, Optional, Tuple
 
-import diffusers
+import torch
 from ConfigSpace import CategoricalHyperparameter, Constant, OrdinalHyperparameter
-from diffusers import BitsAndBytesConfig as DiffusersBitsAndBytesConfig
 
 from pruna.algorithms.quantization import PrunaQuantizer
 from pruna.config.smash_config import SmashConfigPrefixWrapper
@@ -26,7 +30,9 @@ from pruna.engine.model_checks import (
     get_diffusers_transformer_models,
     get_diffusers_unet_models,
 )
-from pruna.engine.utils import safe_memory_cleanup
+from pruna.engine.save import SAVE_FUNCTIONS
+from pruna.engine.utils import needs_cpu_offload, safe_memory_cleanup
+from pruna.logging.logger import pruna_logger
 
 
 class DiffusersInt8Quantizer(PrunaQuantizer):
@@ -73,9 +79,12 @@ class DiffusersInt8Quantizer(PrunaQuantizer):
             Constant("threshold", value=6.0),
             CategoricalHyperparameter(
                 "quant_type",
-                choices=["fp4", "nf4"],
-                default_value="fp4",
-                meta=dict(desc="Quantization type to use."),
+                choices=["fp4", "nf4", "w4a8", "w8a8"],
+                default_value="nf4",
+                meta=dict(
+                    desc="Quantization type to use. w4a8 and w8a8 also quantize activations with torchao, "
+                    "ignoring weight_bits."
+                ),
             ),
         ]
 
@@ -93,15 +102,15 @@ class DiffusersInt8Quantizer(PrunaQuantizer):
         bool
             True if the model is a diffusion model, False otherwise.
         """
-        transformer_and_unet_models = get_diffusers_transformer_models() + get_diffusers_unet_models()
+        latent_model_types = _get_latent_model_types()
 
-        if isinstance(model, tuple(transformer_and_unet_models)):
+        if isinstance(model, latent_model_types):
             return True
 
-        if hasattr(model, "transformer") and isinstance(model.transformer, tuple(transformer_and_unet_models)):
+        if hasattr(model, "transformer") and isinstance(model.transformer, latent_model_types):
             return True
 
-        return hasattr(model, "unet") and isinstance(model.unet, tuple(transformer_and_unet_models))
+        return hasattr(model, "unet") and isinstance(model.unet, latent_model_types)
 
     def _apply(self, model: Any, smash_config: SmashConfigPrefixWrapper) -> Any:
         """
@@ -119,57 +128,72 @@ class DiffusersInt8Quantizer(PrunaQuantizer):
         Any
             The quantized model.
         """
-        with tempfile.TemporaryDirectory(prefix=smash_config["cache_dir"]) as temp_dir:
-            # cast original model to CPU to free memory for smashed model
-            if hasattr(model, "to"):
-                input_device = model.device
+        imported_modules = self.import_algorithm_packages()
+
+        # get the latent model to be quantized, resolved before any eviction so a failure here costs no copies
+        latent, latent_attr = _get_latent(model)
+        latent_class = getattr(imported_modules["diffusers"], type(latent).__name__)
+        # diffusers models expose their dtype directly, which avoids a traversal of the module tree
+        compute_dtype = getattr(latent, "dtype", None) or next(iter(latent.parameters())).dtype
+
+        # quantize activations as well as weights so the matmuls of the latent model run on int8 tensor cores
+        if smash_config["quant_type"] in ("w4a8", "w8a8"):
+            torchao_modules = _import_torchao_quantization()
+            if smash_config["quant_type"] == "w4a8":
+                ao_config = torchao_modules["int8_dynamic_activation_int4_weight"]()
+            else:
+                ao_config = torchao_modules["int8_dynamic_activation_int8_weight"]()
+            torchao_modules["quantize_"](latent, ao_config, device=smash_config["device"])
+            # diffusers can not save and reload the torchao tensor subclasses, so the smashed model is pickled instead
+            smash_config.save_fns.append(SAVE_FUNCTIONS.pickled.name)
+            return model
+
+        # cast original model to CPU to free memory for smashed model, unless the device has enough memory for both
+        if hasattr(model, "to"):
+            input_device = getattr(model, "device", None) or next(iter(model.parameters())).device
+            if needs_cpu_offload(model, smash_config["device"]):
                 model.to("cpu")
                 safe_memory_cleanup()
 
-            # save the latent model (to be quantized) in a temp directory
-            if hasattr(model, "transformer"):
-                model.transformer.save_pretrained(temp_dir)
-                latent_class = getattr(diffusers, type(model.transformer).__name__)
-                compute_dtype = next(iter(model.transformer.parameters())).dtype
-            elif hasattr(model, "unet"):
-                model.unet.save_pretrained(temp_dir)
-                latent_class = getattr(diffusers, type(model.unet).__name__)
-                compute_dtype = next(iter(model.unet.parameters())).dtype
-            else:
-                model.save_pretrained(temp_dir)
-                latent_class = getattr(diffusers, type(model).__name__)
-                compute_dtype = next(iter(model.parameters())).dtype
-
-            bnb_config = DiffusersBitsAndBytesConfig(
-                load_in_8bit=smash_config["weight_bits"] == 8,
-                load_in_4bit=smash_config["weight_bits"] == 4,
-                llm_int8_threshold=float(smash_config["threshold"]),
-                llm_int8_skip_modules=["lm_head"],
-                llm_int8_enable_fp32_cpu_offload=smash_config["enable_fp32_cpu_offload"],
-                llm_int8_has_fp16_weight=smash_config["has_fp16_weight"],
-                bnb_4bit_compute_dtype=compute_dtype,
-                bnb_4bit_quant_type=smash_config["quant_type"],
-                bnb_4bit_use_double_quant=smash_config["double_quant"],
-            )
+        bnb_config = imported_modules["DiffusersBitsAndBytesConfig"](
+            load_in_8bit=smash_config["weight_bits"] == 8,
+            load_in_4bit=smash_config["weight_bits"] == 4,
+            llm_int8_threshold=float(smash_config["threshold"]),
+            llm_int8_skip_modules=["lm_head"],
+            llm_int8_enable_fp32_cpu_offload=smash_config["enable_fp32_cpu_offload"],
+            llm_int8_has_fp16_weight=smash_config["has_fp16_weight"],
+            bnb_4bit_compute_dtype=compute_dtype,
+            bnb_4bit_quant_type=smash_config["quant_type"],
+            bnb_4bit_use_double_quant=smash_config["double_quant"],
+        )
 
-            # re-load the latent model (with the quantization config)
-            smashed_latent = latent_class.from_pretrained(
-                temp_dir,
-                quantization_config=bnb_config,
-                torch_dtype=compute_dtype,
+        try:
+            # quantize the weights of the latent model in memory, without a save and reload of all weights
+            smashed_latent = _quantize_from_state_dict(
+                latent, latent_class, bnb_config, compute_dtype, smash_config["device"]
             )
-            # replace the latent model in the pipeline
-            if hasattr(model, "transformer"):
-                model.transformer = smashed_latent
-            elif hasattr(model, "unet"):
-                model.unet = smashed_latent
-            else:
-                model = smashed_latent
+        except Exception as e:
+            pruna_logger.warning(f"In-memory quantization failed, re-loading the model from disk instead: {e}")
+            with tempfile.TemporaryDirectory(prefix=smash_config["cache_dir"]) as temp_dir:
+                # save the latent model (to be quantized) in a temp directory
+                _save_pretrained_overlapped(latent, temp_dir)
+                # re-load the latent model (with the quantization config)
+                smashed_latent = latent_class.from_pretrained(
+                    temp_dir,
+                    quantization_config=bnb_config,
+                    torch_dtype=compute_dtype,
+                )
 
-            # move the model back to the original device
-            if hasattr(model, "to"):
-                model.to(input_device)
-            return model
+        # replace the latent model in the pipeline
+        if latent_attr is not None:
+            setattr(model, latent_attr, smashed_latent)
+        else:
+            model = smashed_latent
+
+        # move the model back to the original device
+        if hasattr(model, "to"):
+            model.to(input_device)
+        return model
 
     def import_algorithm_packages(self) -> Dict[str, Any]:
         """
@@ -180,4 +204,179 @@ class DiffusersInt8Quantizer(PrunaQuantizer):
         Dict[str, Any]
             The algorithm packages.
         """
-        return dict()
+        import diffusers
+        from diffusers import BitsAndBytesConfig as DiffusersBitsAndBytesConfig
+
+        return dict(diffusers=diffusers, DiffusersBitsAndBytesConfig=DiffusersBitsAndBytesConfig)
+
+
+def _import_torchao_quantization() -> Dict[str, Any]:
+    """
+    Import the torchao activation quantization, which is only needed for the w4a8 and w8a8 quantization types.
+
+    Returns
+    -------
+    Dict[str, Any]
+        The torchao quantization functions.
+    """
+    try:
+        from torchao.quantization import (
+            int8_dynamic_activation_int4_weight,
+            int8_dynamic_activation_int8_weight,
+            quantize_,
+        )
+    except ImportError:
+        raise ImportError(
+            "The w4a8 and w8a8 quantization types require torchao. Please install it using pip install torchao."
+        )
+
+    return dict(
+        quantize_=quantize_,
+        int8_dynamic_activation_int4_weight=int8_dynamic_activation_int4_weight,
+        int8_dynamic_activation_int8_weight=int8_dynamic_activation_int8_weight,
+    )
+
+
+@lru_cache(maxsize=1)
+def _get_latent_model_types() -> tuple:
+    """
+    Get the diffusers transformer and unet model classes, collected once per process.
+
+    Returns
+    -------
+    tuple
+        The transformer and unet model classes.
+    """
+    return tuple(get_diffusers_transformer_models() + get_diffusers_unet_models())
+
+
+def _get_latent(model: Any) -> Tuple[Any, Optional[str]]:
+    """
+    Get the latent model of a diffusers pipeline together with the attribute it is stored under.
+
+    Parameters
+    ----------
+    model : Any
+        The pipeline or the latent model itself.
+
+    Returns
+    -------
+    Tuple[Any, Optional[str]]
+        The latent model and its attribute name on the pipeline, None if the model is the latent model itself.
+    """
+    for attr in ("transformer", "unet"):
+        latent = getattr(model, attr, None)
+        if latent is not None:
+            return latent, attr
+    return model, None
+
+
+def _save_pretrained_overlapped(latent: Any, save_dir: str) -> None:
+    """
+    Save a diffusers model like ``save_pretrained``, overlapping the device-to-host copies with the disk writes.
+
+    Each shard is copied into pinned host memory on a dedicated CUDA stream while the previous shard is written to
+    disk by a background thread. At most two shards are held in pinned memory at a time, tensors that already are on
+    the CPU are handed to the writer without a copy.
+
+    Parameters
+    ----------
+    latent : Any
+        The diffusers model to save.
+    save_dir : str
+        The directory to save the model to.
+    """
+    from diffusers.utils import SAFE_WEIGHTS_INDEX_NAME
+    from huggingface_hub import split_torch_state_dict_into_shards
+    from safetensors.torch import save_file
+
+    latent.save_config(save_dir)
+    state_dict = latent.state_dict()
+    state_dict_split = split_torch_state_dict_into_shards(
+        state_dict, filename_pattern="diffusion_pytorch_model{suffix}.safetensors"
+    )
+    stream = None
+    if torch.cuda.is_available():
+        stream = torch.cuda.Stream()
+        # the copies must not start before pending work on the weights has finished
+        stream.wait_stream(torch.cuda.current_stream())
+
+    def write_shard(shard: Dict[str, torch.Tensor], filename: str, event: Any) -> None:
+        if event is not None:
+            event.synchronize()
+        save_file(shard, os.path.join(save_dir, filename), metadata={"format": "pt"})
+
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        previous_write = None
+        for filename, tensor_names in state_dict_split.filename_to_tensors.items():
+            shard = {}
+            with torch.cuda.stream(stream) if stream is not None else nullcontext():
+                for name in tensor_names:
+                    tensor = state_dict[name]
+                    if tensor.is_cuda:
+                        host_tensor = torch.empty(tensor.shape, dtype=tensor.dtype, device="cpu", pin_memory=True)
+                        tensor = host_tensor.copy_(tensor, non_blocking=True)
+                    shard[name] = tensor
+            event = stream.record_event() if stream is not None else None
+            # the previous shard is written while this one is copied, wait for it before queuing the next write
+            if previous_write is not None:
+                previous_write.result()
+            previous_write = executor.submit(write_shard, shard, filename, event)
+        if previous_write is not None:
+            previous_write.result()
+
+    if state_dict_split.is_sharded:
+        index = {"metadata": state_dict_split.metadata, "weight_map": state_dict_split.tensor_to_filename}
+        with open(os.path.join(save_dir, SAFE_WEIGHTS_INDEX_NAME), "w") as f:
+            json.dump(index, f, indent=2, sort_keys=True)
+
+
+def _quantize_from_state_dict(
+    latent: Any, latent_class: Any, bnb_config: Any, compute_dtype: torch.dtype, device: str
+) -> Any:
+    """
+    Quantize a diffusers model by loading its in-memory state dict into a quantized skeleton.
+
+    This mirrors the quantized loading path of ``from_pretrained`` without writing the weights to disk first.
+
+    Parameters
+    ----------
+    latent : Any
+        The diffusers model to quantize, it is left untouched.
+    latent_class : Any
+        The diffusers class of the model.
+    bnb_config : Any
+        The bitsandbytes quantization config.
+    compute_dtype : torch.dtype
+        The dtype of the non-quantized parameters.
+    device : str
+        The device to quantize the weights on.
+
+    Returns
+    -------
+    Any
+        The quantized model.
+    """
+    from accelerate import init_empty_weights
+    from accelerate.utils import set_module_tensor_to_device
+    from diffusers.quantizers import DiffusersAutoQuantizer
+
+    hf_quantizer = DiffusersAutoQuantizer.from_config(bnb_config, pre_quantized=False)
+    with init_empty_weights():
+        # the quantization config has to be a registered config key, otherwise save_pretrained does not write it
+        smashed_latent = latent_class.from_config({**latent.config, "quantization_config": bnb_config})
+    hf_quantizer.preprocess_model(model=smashed_latent, device_map=None, keep_in_fp32_modules=[])
+
+    state_dict = latent.state_dict()
+    for param_name, param in state_dict.items():
+        if torch.is_floating_point(param):
+            param = param.to(compute_dtype)
+        if hf_quantizer.check_if_quantized_param(smashed_latent, param, param_name, state_dict, param_device=device):
+            hf_quantizer.create_quantized_param(smashed_latent, param, param_name, device, state_dict, [])
+        else:
+            set_module_tensor_to_device(smashed_latent, param_name, device, value=param)
+
+    hf_quantizer.postprocess_model(smashed_latent)
+    smashed_latent.hf_quantizer = hf_quantizer
+    smashed_latent.register_to_config(_pre_quantization_dtype=compute_dtype)
+    return smashed_latent.eval()
@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import math
 import tempfile
 from typing import Any, Dict
 
+import torch
 from ConfigSpace import OrdinalHyperparameter
 from transformers import AutoModelForCausalLM, GPTQConfig
 
@@ -23,7 +25,8 @@ from pruna.config.smash_config import SmashConfigPrefixWrapper
 from pruna.config.smash_space import Boolean
 from pruna.data.utils import recover_text_from_dataloader
 from pruna.engine.model_checks import is_causal_lm
-from pruna.engine.utils import safe_memory_cleanup
+from pruna.engine.utils import needs_cpu_offload, safe_memory_cleanup
+from pruna.logging.logger import pruna_logger
 
 
 class GPTQQuantizer(PrunaQuantizer):
@@ -103,33 +106,55 @@ class GPTQQuantizer(PrunaQuantizer):
             The quantized model.
         """
         with tempfile.TemporaryDirectory(prefix=smash_config["cache_dir"]) as temp_dir:
-            # cast original model to CPU to free memory for smashed model
-            if hasattr(model, "to"):
+            # cast original model to CPU to free memory for smashed model, unless the device has enough memory for both
+            offload_before_quantization = hasattr(model, "to") and needs_cpu_offload(model, smash_config["device"])
+            if offload_before_quantization:
                 model.to("cpu")
                 safe_memory_cleanup()
             model.save_pretrained(temp_dir)
 
             # dataset and tokenizer have been ensured to be set in the config
+            tokenizer: Any = smash_config.tokenizer
             val_dl = smash_config.val_dataloader()
-            calib_data = recover_text_from_dataloader(val_dl, smash_config.tokenizer)  # type: ignore[arg-type]
+            calib_data = recover_text_from_dataloader(val_dl, tokenizer)
+            # duplicated samples only add to the hessian accumulation time without adding information
+            calib_data = list(dict.fromkeys(calib_data))
+            # the exllama v2 kernels only accelerate 4-bit weights
+            exllama_kwargs: Dict[str, Any] = dict(use_exllama=False)
+            if smash_config["weight_bits"] == 4:
+                exllama_kwargs = dict(use_exllama=smash_config["use_exllama"], exllama_config={"version": 2})
+            elif smash_config["use_exllama"]:
+                pruna_logger.info(
+                    f"Exllama kernels only support 4-bit weights, disabling them for {smash_config['weight_bits']} bits."
+                )
             gptq_config = GPTQConfig(
                 bits=smash_config["weight_bits"],
                 group_size=smash_config["group_size"],
                 dataset=calib_data,
-                tokenizer=smash_config.tokenizer,  # type: ignore[attr-defined]
-                model_seqlen=smash_config.tokenizer.max_len_single_sentence + 1,  # type: ignore
-                use_exllama=smash_config["use_exllama"],
-                exllama_config={"version": 2},
+                tokenizer=tokenizer,
+                model_seqlen=tokenizer.max_len_single_sentence + 1,
+                **exllama_kwargs,
             )
 
+            # spread the transformer blocks over all visible GPUs so calibration is not bound to a single device
+            device_map: Any = "auto"
+            if torch.cuda.device_count() > 1:
+                device_map = _get_multi_gpu_device_map(model)
+
             smashed_model = AutoModelForCausalLM.from_pretrained(
                 temp_dir,
                 quantization_config=gptq_config,
-                trust_remote_code=True,
-                device_map="auto",
+                # the checkpoint is local, only trust remote code if the model actually ships custom modeling code
+                trust_remote_code=getattr(model.config, "auto_map", None) is not None,
+                local_files_only=True,
                 torch_dtype="auto",
+                device_map=device_map,
             )
 
+        # the original model is not needed on the device anymore, it does not occupy memory next to the smashed model
+        if hasattr(model, "to") and not offload_before_quantization:
+            model.to("cpu")
+            safe_memory_cleanup()
         return smashed_model
 
     def import_algorithm_packages(self) -> Dict[str, Any]:
@@ -142,3 +167,37 @@ class GPTQQuantizer(PrunaQuantizer):
             The algorithm packages.
         """
         return dict()
+
+
+def _get_multi_gpu_device_map(model: Any) -> Dict[str, int]:
+    """
+    Build a device map splitting the transformer blocks into contiguous slices, one slice per visible GPU.
+
+    Neighbouring blocks share a GPU so activations only move between devices at the slice boundaries.
+    The embeddings, the final norm and the language modeling head stay on the first GPU.
+
+    Parameters
+    ----------
+    model : Any
+        The causal language model to distribute.
+
+    Returns
+    -------
+    Dict[str, int]
+        The device map from module names to GPU indices.
+    """
+    num_gpus = torch.cuda.device_count()
+    # the transformer blocks are the largest module list of the model
+    block_lists = [(name, module) for name, module in model.named_modules() if isinstance(module, torch.nn.ModuleList)]
+    blocks_name, blocks = max(block_lists, key=lambda item: len(item[1]))
+    blocks_per_gpu = math.ceil(len(blocks) / num_gpus)
+
+    device_map: Dict[str, int] = {f"{blocks_name}.{i}": i // blocks_per_gpu for i in range(len(blocks))}
+    # tied weights are only listed once by default, which would leave e.g. a tied language modeling head unmapped
+    named_tensors = list(model.named_parameters(remove_duplicate=False)) + list(
+        model.named_buffers(remove_duplicate=False)
+    )
+    for name, _ in named_tensors:
+        if not name.startswith(f"{blocks_name}."):
+            device_map[name.rsplit(".", 1)[0]] = 0
+    return device_map
@@ -15,22 +15,29 @@
 import atexit
 import json
 import os
+import re
 import shutil
 import tempfile
-from functools import singledispatchmethod
-from typing import Any, Union
+import uuid
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from copy import deepcopy
+from functools import lru_cache, singledispatchmethod
+from typing import TYPE_CHECKING, Any, Callable, Union
 from warnings import warn
 
 import numpy as np
 import torch
-import transformers
 from ConfigSpace import Configuration, ConfigurationSpace
-from transformers import AutoProcessor, AutoTokenizer
 
 from pruna.config.smash_space import ALGORITHM_GROUPS, SMASH_SPACE
 from pruna.data.pruna_datamodule import PrunaDataModule, TokenizerMissingError
 from pruna.logging.logger import pruna_logger
 
+# transformers is only needed once a tokenizer or processor is loaded, import it lazily there
+if TYPE_CHECKING:
+    import transformers
+
 ADDITIONAL_ARGS = [
     "max_batch_size",
     "device",
@@ -39,11 +46,40 @@ ADDITIONAL_ARGS = [
     "load_fn",
     "reapply_after_load",
 ]
+# frozen views for membership tests on the item access paths, the list above keeps the serialization order
+ADDITIONAL_ARGS_SET = frozenset(ADDITIONAL_ARGS)
+ADDITIONAL_ARGS_AND_ALGORITHM_GROUPS = ADDITIONAL_ARGS_SET | frozenset(ALGORITHM_GROUPS)
 
 TOKENIZER_SAVE_PATH = "tokenizer/"
 PROCESSOR_SAVE_PATH = "processor/"
 SMASH_CONFIG_FILE_NAME = "smash_config.json"
 
+# deprecated plural algorithm groups, e.g. quantizers instead of quantizer
+DEPRECATED_ALGORITHM_GROUPS = frozenset(
+    ["quantizers", "pruners", "distillers", "cachers", "recoverers", "compilers", "batchers"]
+)
+ALGORITHM_GROUPS_WITH_DEPRECATED = frozenset(ALGORITHM_GROUPS) | DEPRECATED_ALGORITHM_GROUPS
+# deprecated algorithm names mapped to their current names
+DEPRECATED_ALGORITHM_NAMES = {
+    "llm_lora": "text_to_text_perp",
+    "llm-lora": "text_to_text_perp",
+    "text_to_text_lora": "text_to_text_perp",
+    "text_to_image_lora": "text_to_image_perp",
+    "torch-structured": "torch_structured",
+    "torch-unstructured": "torch_unstructured",
+    "llm-int8": "llm_int8",
+    "diffusers2": "stable_fast",
+    "x-fast": "x_fast",
+    "cgenerate": "c_generate",
+    "ctranslate": "c_translate",
+    "cwhisper": "c_whisper",
+    "ws2t": "whisper_s2t",
+    "step_caching": "deepcache",
+}
+# deprecated prefixes of algorithm hyperparameters, matched in a single pass
+DEPRECATED_PREFIXES = ("quant_", "prune_", "comp_", "recov_", "distill_", "cache_", "batch_")
+_DEPRECATED_PREFIX_RE = re.compile(f"({'|'.join(DEPRECATED_PREFIXES)})(.*)", re.DOTALL)
+
 
 class SmashConfig:
     """
@@ -61,6 +97,25 @@ class SmashConfig:
         The configuration to be used for smashing. If None, a default configuration will be created.
     """
 
+    __slots__ = (
+        "_configuration",
+        "_native_values",
+        "config_space",
+        "max_batch_size",
+        "device",
+        "cache_dir_prefix",
+        "_cache_dir",
+        "save_fns",
+        "load_fn",
+        "reapply_after_load",
+        "tokenizer",
+        "processor",
+        "_data",
+        "_prepare_saving",
+        "_finalizer",
+        "__weakref__",
+    )
+
     def __init__(
         self,
         max_batch_size: int = 1,
@@ -73,13 +128,13 @@ class SmashConfig:
             SMASH_SPACE.get_default_configuration() if configuration is None else configuration
         )
         self.config_space: ConfigurationSpace = self._configuration.config_space
+        self._update_native_values()
         self.max_batch_size = max_batch_size
         self.device = device
 
+        # the cache directory lives in a directory shared by all configs of this process and is only created on use
         self.cache_dir_prefix = cache_dir_prefix
-        if not os.path.exists(cache_dir_prefix):
-            os.makedirs(cache_dir_prefix)
-        self.cache_dir = tempfile.mkdtemp(dir=cache_dir_prefix)
+        self._cache_dir = _new_cache_dir_path(cache_dir_prefix)
 
         self.save_fns: list[str] = []
         self.load_fn: str | None = None
@@ -91,12 +146,49 @@ class SmashConfig:
         # internal variable *to save time* by avoiding compilers saving models for inference-only smashing
         self._prepare_saving = True
 
-        # ensure the cache directory is deleted on program exit
-        atexit.register(self.cleanup_cache_dir)
+        # ensure the cache directory is deleted once the config is garbage collected or on program exit,
+        # the finalizer only holds the path so it does not keep the config alive
+        self._finalizer = weakref.finalize(self, _cleanup_cache_dir, self._cache_dir)
 
-    def __del__(self) -> None:
-        """Delete the SmashConfig object."""
-        self.cleanup_cache_dir()
+    @property
+    def cache_dir(self) -> str:
+        """The cache directory of the SmashConfig, created on first access."""
+        os.makedirs(self._cache_dir, exist_ok=True)
+        return self._cache_dir
+
+    @cache_dir.setter
+    def cache_dir(self, path: str) -> None:
+        self._finalizer.detach()
+        self._cache_dir = path
+        self._finalizer = weakref.finalize(self, _cleanup_cache_dir, path)
+
+    def _update_native_values(self, name: str | None = None) -> None:
+        """
+        Cache the values of the active hyperparameters as native Python types.
+
+        Config space internally holds numpy types, we convert them once whenever the configuration changes
+        instead of on every read. Setting a single value can only (de)activate the conditional hyperparameters below
+        it, so only these are refreshed.
+
+        Parameters
+        ----------
+        name : str | None
+            The hyperparameter that was set, None refreshes all values after the whole configuration was replaced.
+        """
+        if name is None:
+            self._native_values = {k: convert_numpy_types(v) for k, v in dict(self._configuration).items()}
+            return
+
+        config_space = self._configuration.config_space
+        pending = [name]
+        while pending:
+            key = pending.pop()
+            try:
+                self._native_values[key] = convert_numpy_types(self._configuration[key])
+            except KeyError:
+                # the configuration raises for inactive hyperparameters
+                self._native_values.pop(key, None)
+            pending.extend(child.name for child in config_space.children_of[key])
 
     def __eq__(self, other: Any) -> bool:
         """Check if two SmashConfigs are equal."""
@@ -113,15 +205,38 @@ class SmashConfig:
             and self.reapply_after_load == other.reapply_after_load
         )
 
+    def __copy__(self) -> "SmashConfig":
+        """
+        Copy the SmashConfig without deep copying the tokenizer, processor and data.
+
+        The configuration values, save functions and algorithms to reapply are copied so changes to them do not leak
+        into the original. The copy gets its own cache directory.
+
+        Returns
+        -------
+        SmashConfig
+            The copied SmashConfig.
+        """
+        smash_config = self.__class__.__new__(self.__class__)
+        for slot in self.__slots__:
+            if slot not in ("__weakref__", "_cache_dir", "_finalizer"):
+                setattr(smash_config, slot, getattr(self, slot))
+        smash_config._cache_dir = _new_cache_dir_path(self.cache_dir_prefix)
+        smash_config._finalizer = weakref.finalize(smash_config, _cleanup_cache_dir, smash_config._cache_dir)
+        smash_config._configuration = Configuration(self.config_space, values=dict(self._configuration))
+        smash_config._native_values = dict(self._native_values)
+        smash_config.save_fns = list(self.save_fns)
+        smash_config.reapply_after_load = dict(self.reapply_after_load)
+        return smash_config
+
     def cleanup_cache_dir(self) -> None:
         """Clean up the cache directory."""
-        if os.path.exists(self.cache_dir):
-            shutil.rmtree(self.cache_dir)
+        _cleanup_cache_dir(self._cache_dir)
 
     def reset_cache_dir(self) -> None:
         """Reset the cache directory."""
         self.cleanup_cache_dir()
-        self.cache_dir = tempfile.mkdtemp(dir=self.cache_dir_prefix)
+        self.cache_dir = _new_cache_dir_path(self.cache_dir_prefix)
 
     def load_from_json(self, path: str) -> None:
         """
@@ -132,9 +247,9 @@ class SmashConfig:
         path : str
             The file path to the JSON file containing the configuration.
         """
-        with open(os.path.join(path, SMASH_CONFIG_FILE_NAME), "r") as f:
-            json_string = f.read()
-            config_dict = json.loads(json_string)
+        # read the raw bytes in one call, the JSON decoder detects the encoding itself
+        with open(os.path.join(path, SMASH_CONFIG_FILE_NAME), "rb") as f:
+            config_dict = json.loads(f.read())
 
         for name in ADDITIONAL_ARGS:
             # do not load the old cache directory
@@ -144,12 +259,27 @@ class SmashConfig:
             setattr(self, name, config_dict.pop(name))
 
         self._configuration = Configuration(SMASH_SPACE, values=config_dict)
-
-        if os.path.exists(os.path.join(path, TOKENIZER_SAVE_PATH)):
-            self.tokenizer = AutoTokenizer.from_pretrained(os.path.join(path, TOKENIZER_SAVE_PATH))
-
-        if os.path.exists(os.path.join(path, PROCESSOR_SAVE_PATH)):
-            self.processor = AutoProcessor.from_pretrained(os.path.join(path, PROCESSOR_SAVE_PATH))
+        self._update_native_values()
+
+        # import in the main thread, the loaders below may run in worker threads
+        from transformers import AutoProcessor, AutoTokenizer
+
+        tokenizer_path = os.path.join(path, TOKENIZER_SAVE_PATH)
+        processor_path = os.path.join(path, PROCESSOR_SAVE_PATH)
+        load_tokenizer = os.path.exists(tokenizer_path)
+        load_processor = os.path.exists(processor_path)
+
+        if load_tokenizer and load_processor:
+            # both loads are dominated by small file reads and parsing, overlap them
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                tokenizer_future = executor.submit(AutoTokenizer.from_pretrained, tokenizer_path)
+                processor_future = executor.submit(AutoProcessor.from_pretrained, processor_path)
+                self.tokenizer = tokenizer_future.result()
+                self.processor = processor_future.result()
+        elif load_tokenizer:
+            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_path)
+        elif load_processor:
+            self.processor = AutoProcessor.from_pretrained(processor_path)
 
     def save_to_json(self, path: str) -> None:
         """
@@ -161,15 +291,12 @@ class SmashConfig:
             The file path where the JSON file will be saved.
         """
         config_dict = dict(self._configuration)
-        for key, value in config_dict.items():
-            config_dict[key] = convert_numpy_types(value)
-
         for name in ADDITIONAL_ARGS:
             config_dict[name] = getattr(self, name)
 
-        # Save the updated dictionary back to a JSON file
+        # Save the updated dictionary back to a JSON file, numpy types are only converted when the encoder meets them
         with open(os.path.join(path, SMASH_CONFIG_FILE_NAME), "w") as f:
-            json.dump(config_dict, f, indent=4)
+            f.write(json.dumps(config_dict, indent=4, default=_json_default))
 
         if self.tokenizer:
             self.tokenizer.save_pretrained(os.path.join(path, TOKENIZER_SAVE_PATH))
@@ -198,8 +325,8 @@ class SmashConfig:
         )
         """
         # since this function is only used for loading algorithm settings, we will ignore additional arguments
-        filtered_config_dict = {k: v for k, v in config_dict.items() if k not in ADDITIONAL_ARGS}
-        discarded_args = [k for k in config_dict if k in ADDITIONAL_ARGS]
+        filtered_config_dict = {k: v for k, v in config_dict.items() if k not in ADDITIONAL_ARGS_SET}
+        discarded_args = [k for k in config_dict if k in ADDITIONAL_ARGS_SET]
         if discarded_args:
             pruna_logger.info(f"Discarded arguments: {discarded_args}")
 
@@ -222,6 +349,7 @@ class SmashConfig:
         SmashConfig()
         """
         self._configuration = SMASH_SPACE.get_default_configuration()
+        self._update_native_values()
 
         # flush also saving / load functionality associated with a specific configuration
         self.save_fns = []
@@ -309,42 +437,42 @@ class SmashConfig:
 
     @add_data.register
     def _(self, dataset_name: str, *args, **kwargs) -> None:
-        try:
-            kwargs["tokenizer"] = self.tokenizer
-            self._data = PrunaDataModule.from_string(dataset_name, *args, **kwargs)
-        except TokenizerMissingError:
-            raise ValueError(
-                f"Tokenizer is required for {dataset_name} but not provided. "
-                "Please provide a tokenizer with smash_config.add_tokenizer()."
-            ) from None
+        self._add_data_from(PrunaDataModule.from_string, dataset_name, dataset_name, *args, **kwargs)
 
     @add_data.register(list)
-    def _(self, datasets: list, collate_fn: str, *args, **kwargs) -> None:
-        try:
-            kwargs["tokenizer"] = self.tokenizer
-            self._data = PrunaDataModule.from_datasets(datasets, collate_fn, *args, **kwargs)
-        except TokenizerMissingError:
-            raise ValueError(
-                f"Tokenizer is required for {collate_fn} but not provided. "
-                "Please provide a tokenizer with smash_config.add_tokenizer()."
-            ) from None
-
     @add_data.register(tuple)
-    def _(self, datasets: tuple, collate_fn: str, *args, **kwargs) -> None:
+    def _(self, datasets: list | tuple, collate_fn: str, *args, **kwargs) -> None:
+        self._add_data_from(PrunaDataModule.from_datasets, collate_fn, datasets, collate_fn, *args, **kwargs)
+
+    @add_data.register(PrunaDataModule)
+    def _(self, datamodule: PrunaDataModule) -> None:
+        self._data = datamodule
+
+    def _add_data_from(self, loader: Callable[..., PrunaDataModule], data_name: str, *args, **kwargs) -> None:
+        """
+        Create the data module of the SmashConfig with the given loader, passing the tokenizer of the SmashConfig.
+
+        Parameters
+        ----------
+        loader : Callable[..., PrunaDataModule]
+            The PrunaDataModule constructor to use.
+        data_name : str
+            The name of the dataset or collate function, used in the error message for a missing tokenizer.
+        *args : Any
+            The arguments to pass to the loader.
+        **kwargs : Any
+            The keyword arguments to pass to the loader.
+        """
         try:
             kwargs["tokenizer"] = self.tokenizer
-            self._data = PrunaDataModule.from_datasets(datasets, collate_fn, *args, **kwargs)
+            self._data = loader(*args, **kwargs)
         except TokenizerMissingError:
             raise ValueError(
-                f"Tokenizer is required for {collate_fn} but not provided. "
+                f"Tokenizer is required for {data_name} but not provided. "
                 "Please provide a tokenizer with smash_config.add_tokenizer()."
             ) from None
 
-    @add_data.register(PrunaDataModule)
-    def _(self, datamodule: PrunaDataModule) -> None:
-        self._data = datamodule
-
-    def add_tokenizer(self, tokenizer: str | transformers.AutoTokenizer) -> None:
+    def add_tokenizer(self, tokenizer: "str | transformers.AutoTokenizer") -> None:
         """
         Add a tokenizer to the SmashConfig.
 
@@ -354,11 +482,12 @@ class SmashConfig:
             The tokenizer to be added to the SmashConfig.
         """
         if isinstance(tokenizer, str):
-            self.tokenizer = AutoTokenizer.from_pretrained(tokenizer)
+            # the parsed tokenizer is shared, every config gets its own copy to set e.g. the padding side on
+            self.tokenizer = deepcopy(_load_tokenizer(tokenizer))
         else:
             self.tokenizer = tokenizer
 
-    def add_processor(self, processor: str | transformers.AutoProcessor) -> None:
+    def add_processor(self, processor: "str | transformers.AutoProcessor") -> None:
         """
         Add a processor to the SmashConfig.
 
@@ -368,7 +497,8 @@ class SmashConfig:
             The processor to be added to the SmashConfig.
         """
         if isinstance(processor, str):
-            self.processor = AutoProcessor.from_pretrained(processor)
+            # the parsed processor is shared, every config gets its own copy to modify
+            self.processor = deepcopy(_load_processor(processor))
         else:
             self.processor = processor
 
@@ -382,15 +512,21 @@ class SmashConfig:
             The algorithm name that is about to be activated.
         """
         algorithm_requirements = SMASH_SPACE.model_requirements[algorithm_name]
-        if algorithm_requirements["tokenizer_required"] and self.tokenizer is None:
+        tokenizer_required = algorithm_requirements["tokenizer_required"]
+        processor_required = algorithm_requirements["processor_required"]
+        dataset_required = algorithm_requirements["dataset_required"]
+        # most algorithms have no requirements, skip the attribute lookups on the config for them
+        if not (tokenizer_required or processor_required or dataset_required):
+            return
+        if tokenizer_required and self.tokenizer is None:
             raise ValueError(
                 f"{algorithm_name} requires a tokenizer. Please provide it with smash_config.add_tokenizer()."
             )
-        if algorithm_requirements["processor_required"] and self.processor is None:
+        if processor_required and self.processor is None:
             raise ValueError(
                 f"{algorithm_name} requires a processor. Please provide it with smash_config.add_processor()."
             )
-        if algorithm_requirements["dataset_required"] and self._data is None:
+        if dataset_required and self._data is None:
             raise ValueError(f"{algorithm_name} requires a dataset. Please provide it with smash_config.add_data().")
 
     def get_tokenizer_name(self) -> str | None:
@@ -430,13 +566,13 @@ class SmashConfig:
         >>> config["quantizer"]
         "awq"
         """
-        if name in ADDITIONAL_ARGS:
+        if name in ADDITIONAL_ARGS_SET:
             return getattr(self, name)
+        elif name in self._native_values:
+            return self._native_values[name]
         else:
-            return_value = self._configuration.__getitem__(name)
-            # config space internally holds numpy types
-            # we convert this to native python types for printing and handing arguments to pruna algorithms
-            return convert_numpy_types(return_value)
+            # inactive hyperparameters are not part of the native values, let the configuration raise for them
+            return convert_numpy_types(self._configuration.__getitem__(name))
 
     def __setitem__(self, name: str, value: Any) -> None:
         """
@@ -462,20 +598,11 @@ class SmashConfig:
         "awq"
         """
         deprecated = False
-        deprecated_algorithm_groups = [
-            "quantizers",
-            "pruners",
-            "distillers",
-            "cachers",
-            "recoverers",
-            "compilers",
-            "batchers",
-        ]
-        if name in ADDITIONAL_ARGS:
+        if name in ADDITIONAL_ARGS_SET:
             return setattr(self, name, value)
-        elif name in ALGORITHM_GROUPS + deprecated_algorithm_groups:
+        elif name in ALGORITHM_GROUPS_WITH_DEPRECATED:
             # deprecation logic for assignment of plural algorithm groups, e.g. quantizers
-            if name in deprecated_algorithm_groups:
+            if name in DEPRECATED_ALGORITHM_GROUPS:
                 new_algorithm_group = name[:-1]
                 warn(f"The algorithm group {name} is deprecated.", DeprecationWarning, stacklevel=2)
                 name = new_algorithm_group
@@ -486,29 +613,13 @@ class SmashConfig:
                 deprecated = True
                 warn("Assigning algorithms as lists is deprecated...", DeprecationWarning, stacklevel=2)
             # deprecating old method names
-            deprecated_algorithm_names = {
-                "llm_lora": "text_to_text_perp",
-                "llm-lora": "text_to_text_perp",
-                "text_to_text_lora": "text_to_text_perp",
-                "text_to_image_lora": "text_to_image_perp",
-                "torch-structured": "torch_structured",
-                "torch-unstructured": "torch_unstructured",
-                "llm-int8": "llm_int8",
-                "diffusers2": "stable_fast",
-                "x-fast": "x_fast",
-                "cgenerate": "c_generate",
-                "ctranslate": "c_translate",
-                "cwhisper": "c_whisper",
-                "ws2t": "whisper_s2t",
-                "step_caching": "deepcache",
-            }
-            if value in list(deprecated_algorithm_names.keys()):
+            if value in DEPRECATED_ALGORITHM_NAMES:
                 warn(
-                    f"The {value} method has been renamed to {deprecated_algorithm_names[value]}.",
+                    f"The {value} method has been renamed to {DEPRECATED_ALGORITHM_NAMES[value]}.",
                     DeprecationWarning,
                     stacklevel=2,
                 )
-                value = deprecated_algorithm_names[value]
+                value = DEPRECATED_ALGORITHM_NAMES[value]
                 deprecated = True
             ###
             # end of deprecation logic for assignment of algorithms as lists
@@ -517,40 +628,40 @@ class SmashConfig:
             if deprecated:
                 warn(f"Continuing with setting smash_config['{name}'] = '{value}'.", DeprecationWarning, stacklevel=2)
             self._configuration.__setitem__(name, value)
+            self._update_native_values(name)
         else:
             # isolating prefix behavior here for easy removal later
-            deprecated_prefixes = ["quant_", "prune_", "comp_", "recov_", "distill_", "cache_", "batch_"]
-
             def remove_starting_prefix(s: str) -> str:
-                for prefix in deprecated_prefixes:
-                    if s.startswith(prefix):
-                        warn(
-                            f"The {prefix} prefix is deprecated. Please use the {s[len(prefix) :]} instead.",
-                            DeprecationWarning,
-                            stacklevel=2,
-                        )
-                        return s[len(prefix) :]
-                return s
+                match = _DEPRECATED_PREFIX_RE.match(s)
+                if match is None:
+                    return s
+                prefix, stripped = match.groups()
+                warn(
+                    f"The {prefix} prefix is deprecated. Please use the {stripped} instead.",
+                    DeprecationWarning,
+                    stacklevel=2,
+                )
+                return stripped
 
             name = remove_starting_prefix(name)
             # deprecation logic over
-            return self._configuration.__setitem__(name, value)
+            self._configuration.__setitem__(name, value)
+            self._update_native_values(name)
 
     def __getattr__(self, attr: str) -> object:  # noqa: D105
-        if attr == "_data":
-            return self.__dict__.get("_data")
-        elif attr == "_configuration":
-            return self.__dict__.get("_configuration")
+        # only reached for unset slots, e.g. while the config is being initialized
+        if attr in ("_data", "_configuration"):
+            return None
         return_value = getattr(self._configuration, attr)
         # config space internally holds numpy types
         # we convert this to native python types for printing and handing arguments to pruna algorithms
         return convert_numpy_types(return_value)
 
     def __str__(self) -> str:  # noqa: D105
-        values = dict(self._configuration)
+        values = self._native_values
         header = "SmashConfig("
         lines = [
-            f"  '{k}': {convert_numpy_types(values[k])!r},"
+            f"  '{k}': {values[k]!r},"
             for k in sorted(values, key=self._configuration.config_space.index_of.get)  # type: ignore
             # determine whether hyperparameter is conditionally active
             if values[k] is not None or len(self._configuration.config_space.parents_of[k]) > 0
@@ -574,6 +685,8 @@ class SmashConfigPrefixWrapper:
         The prefix to add to the config keys.
     """
 
+    __slots__ = ("_base_config", "_prefix")
+
     def __init__(self, base_config: Union[SmashConfig, "SmashConfigPrefixWrapper"], prefix: str) -> None:
         self._base_config = base_config
         self._prefix = prefix
@@ -592,7 +705,7 @@ class SmashConfigPrefixWrapper:
         Any
             The value from the config.
         """
-        if key in ADDITIONAL_ARGS + ALGORITHM_GROUPS:
+        if key in ADDITIONAL_ARGS_AND_ALGORITHM_GROUPS:
             return self._base_config[key]
         actual_key = self._prefix + key
         return self._base_config[actual_key]
@@ -632,3 +745,105 @@ def convert_numpy_types(input_value: Any) -> Any:
         return input_value.item()
     else:
         return input_value
+
+
+@lru_cache(maxsize=8)
+def _load_tokenizer(name: str) -> Any:
+    """
+    Load a tokenizer by name, the most recently used tokenizers are kept so repeated loads are only parsed once.
+
+    The returned tokenizer is shared between all callers, copy it before modifying it.
+
+    Parameters
+    ----------
+    name : str
+        The name or path of the tokenizer.
+
+    Returns
+    -------
+    Any
+        The loaded tokenizer.
+    """
+    from transformers import AutoTokenizer
+
+    return AutoTokenizer.from_pretrained(name)
+
+
+@lru_cache(maxsize=8)
+def _load_processor(name: str) -> Any:
+    """
+    Load a processor by name, the most recently used processors are kept so repeated loads are only parsed once.
+
+    The returned processor is shared between all callers, copy it before modifying it.
+
+    Parameters
+    ----------
+    name : str
+        The name or path of the processor.
+
+    Returns
+    -------
+    Any
+        The loaded processor.
+    """
+    from transformers import AutoProcessor
+
+    return AutoProcessor.from_pretrained(name)
+
+
+_PROCESS_CACHE_DIRS: dict[str, str] = dict()
+
+
+def _new_cache_dir_path(cache_dir_prefix: str) -> str:
+    """
+    Get a new, not yet created, cache directory path inside the cache directory of this process.
+
+    Parameters
+    ----------
+    cache_dir_prefix : str
+        The prefix under which the cache directory of this process is created.
+
+    Returns
+    -------
+    str
+        The path of the new cache directory.
+    """
+    if cache_dir_prefix not in _PROCESS_CACHE_DIRS:
+        os.makedirs(cache_dir_prefix, exist_ok=True)
+        process_cache_dir = tempfile.mkdtemp(dir=cache_dir_prefix)
+        # the cache directories of individual configs are removed with them, this removes the shared parent
+        atexit.register(_cleanup_cache_dir, process_cache_dir)
+        _PROCESS_CACHE_DIRS[cache_dir_prefix] = process_cache_dir
+    return os.path.join(_PROCESS_CACHE_DIRS[cache_dir_prefix], uuid.uuid4().hex)
+
+
+def _cleanup_cache_dir(path: str) -> None:
+    """
+    Remove a cache directory if it exists.
+
+    Parameters
+    ----------
+    path : str
+        The path of the cache directory.
+    """
+    # a missing directory is ignored, which also covers repeated and racing cleanups
+    shutil.rmtree(path, ignore_errors=True)
+
+
+def _json_default(value: Any) -> Any:
+    """
+    Convert values the JSON encoder can not serialize natively, i.e. numpy types held by the configuration.
+
+    Parameters
+    ----------
+    value : Any
+        The value the JSON encoder could not serialize.
+
+    Returns
+    -------
+    Any
+        The native Python value.
+    """
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
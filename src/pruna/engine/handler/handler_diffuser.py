@@ -13,10 +13,10 @@
 # limitations under the License.
 
 import inspect
-from typing import Any, Dict, Optional, Tuple
+from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
 import torch
-from torchvision import transforms
 
 from pruna.engine.handler.handler_inference import InferenceHandler
 from pruna.logging.logger import pruna_logger
@@ -36,14 +36,80 @@ class DiffuserHandler(InferenceHandler):
         The signature of the call to the model.
     model_args : Dict[str, Any]
         The arguments to pass to the model.
+    device : str | torch.device
+        The device the model runs on, the generator is created there to sample the noise without a host copy.
+        The generator is recreated with the same seed whenever the inputs are moved to another device.
+    output_dtype : torch.dtype
+        The dtype of the processed images. Floating point images are normalized to [0, 1].
+    output_device : str | torch.device | None
+        The device floating point images are moved to before they are normalized, None keeps them on the host.
     """
 
-    def __init__(self, call_signature: inspect.Signature, model_args: Optional[Dict[str, Any]] = None) -> None:
-        default_args = {"generator": torch.Generator("cpu").manual_seed(42)}
+    def __init__(
+        self,
+        call_signature: inspect.Signature,
+        model_args: Optional[Dict[str, Any]] = None,
+        device: str | torch.device = "cpu",
+        output_dtype: torch.dtype = torch.uint8,
+        output_device: str | torch.device | None = None,
+    ) -> None:
+        self.generator = self._create_generator(device)
+        default_args = {"generator": self.generator}
         self.call_signature = call_signature
         if model_args:
             default_args.update(model_args)
         self.model_args = default_args
+        self.output_dtype = output_dtype
+        self.output_device = output_device
+
+    @staticmethod
+    def _create_generator(device: str | torch.device) -> torch.Generator:
+        """
+        Create a generator with the fixed seed on the given device, falling back to cpu if that is not possible.
+
+        Parameters
+        ----------
+        device : str | torch.device
+            The device to create the generator on.
+
+        Returns
+        -------
+        torch.Generator
+            The seeded generator.
+        """
+        try:
+            generator = torch.Generator(device=device)
+        except RuntimeError:
+            pruna_logger.debug(f"Could not create a generator on {device}, falling back to cpu.")
+            generator = torch.Generator("cpu")
+        return generator.manual_seed(42)
+
+    def move_inputs_to_device(
+        self,
+        inputs: List[str] | torch.Tensor | Tuple[List[str] | torch.Tensor, ...],
+        device: torch.device | str = "cuda",
+    ) -> List[str] | torch.Tensor | Tuple[List[str] | torch.Tensor, ...]:
+        """
+        Recursively move inputs to device and recreate the seeded generator there if the model has moved.
+
+        Parameters
+        ----------
+        inputs : List[str] | torch.Tensor
+            The inputs to prepare.
+        device : torch.device | str
+            The device to move the inputs to.
+
+        Returns
+        -------
+        List[str] | torch.Tensor
+            The prepared inputs.
+        """
+        target = torch.device(device)
+        # a generator passed in the model arguments by the user is left untouched
+        if self.model_args.get("generator") is self.generator and not _is_on_device(self.generator, target):
+            self.generator = self._create_generator(target)
+            self.model_args["generator"] = self.generator
+        return super().move_inputs_to_device(inputs, device)
 
     def prepare_inputs(self, batch: Tuple[Any, ...]) -> Any:
         """
@@ -77,10 +143,19 @@ class DiffuserHandler(InferenceHandler):
         Returns
         -------
         torch.Tensor
-            The processed images.
+            The processed images, uint8 in [0, 255] or normalized to [0, 1] for floating point output dtypes.
         """
-        generated = output.images
-        return torch.stack([transforms.PILToTensor()(g) for g in generated])
+        # a single contiguous numpy batch avoids a tensor allocation per image before stacking
+        generated = np.stack([np.asarray(g, dtype=np.uint8) for g in output.images])
+        if generated.ndim == 3:  # single channel images
+            generated = generated[..., None]
+        images = torch.from_numpy(generated).permute(0, 3, 1, 2)
+        if self.output_dtype == torch.uint8:
+            return images.contiguous()
+        # copy the compact uint8 images and normalize them on the device with a single cast and in-place division
+        if self.output_device is not None:
+            images = images.to(self.output_device, non_blocking=True)
+        return images.to(self.output_dtype, memory_format=torch.contiguous_format).div_(255.0)
 
     def log_model_info(self) -> None:
         """Log information about the inference handler."""
@@ -89,3 +164,8 @@ class DiffuserHandler(InferenceHandler):
             "- The first element of the batch is passed as input.\n"
             "- The generated outputs are expected to have .images attribute."
         )
+
+
+def _is_on_device(generator: torch.Generator, device: torch.device) -> bool:
+    """Check whether the generator lives on the device, a device without index matches any index of its type."""
+    return generator.device.type == device.type and device.index in (None, generator.device.index)
@@ -85,7 +85,9 @@ class InferenceHandler(ABC):
             The prepared inputs.
         """
         if isinstance(inputs, torch.Tensor):
-            return inputs.to(device)
+            # queue the copies without a host sync per tensor, consumers on the device are ordered on the same stream,
+            # copies to the cpu stay blocking since the host could otherwise read the tensor before it has arrived
+            return inputs.to(device, non_blocking=torch.device(device).type != "cpu")
         elif isinstance(inputs, tuple):
             return tuple(self.move_inputs_to_device(item, device) for item in inputs)  # type: ignore
         else:
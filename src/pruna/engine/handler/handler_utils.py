@@ -24,6 +24,10 @@ HANDLER_EXCEPTIONS: dict[type[InferenceHandler], list[str]] = {
     TransformerHandler: ["OptAWQForCausalLM", "AutoHQQHFModel", "TranslatorWrapper", "GeneratorWrapper"],
     DiffuserHandler: ["OnediffWrapper", "AutoHQQHFDiffusersModel"],
 }
+# flat view of the exceptions for a single lookup by model class name
+_HANDLER_BY_CLASS_NAME: dict[str, type[InferenceHandler]] = {
+    model_class: handler for handler, model_classes in HANDLER_EXCEPTIONS.items() for model_class in model_classes
+}
 
 
 def register_inference_handler(model: Any) -> InferenceHandler:
@@ -45,9 +49,10 @@ def register_inference_handler(model: Any) -> InferenceHandler:
     if handler is not None:
         return handler
 
-    if "diffusers" in model.__module__:
-        return DiffuserHandler(call_signature=inspect.signature(model.__call__))
-    elif "transformers" in model.__module__:
+    model_module = model.__module__
+    if "diffusers" in model_module:
+        return DiffuserHandler(call_signature=inspect.signature(model.__call__), device=getattr(model, "device", "cpu"))
+    elif "transformers" in model_module:
         return TransformerHandler()
     else:
         return StandardHandler()
@@ -69,8 +74,5 @@ def scan_for_exceptions(model: Any) -> InferenceHandler | None:
     """
     # instead of checking with isinstance for the class itself we check the module name
     # this avoids directly importing external packages
-    for handler, model_classes in HANDLER_EXCEPTIONS.items():
-        for model_class in model_classes:
-            if model_class == model.__class__.__name__:
-                return handler()
-    return None
+    handler = _HANDLER_BY_CLASS_NAME.get(model.__class__.__name__)
+    return handler() if handler is not None else None
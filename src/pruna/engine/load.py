@@ -13,21 +13,18 @@
 # limitations under the License.
 
 import inspect
-import json
 import os
+import pickle
 import sys
-from copy import deepcopy
+from copy import copy
 from enum import Enum
-from functools import partial
+from functools import lru_cache, partial
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Literal, Optional, Union
 
-import diffusers
 import torch
-import transformers
 from huggingface_hub import constants, snapshot_download
 from tqdm.auto import tqdm as base_tqdm
-from transformers import pipeline
 
 from pruna import SmashConfig
 from pruna.engine.utils import load_json_config
@@ -64,6 +61,15 @@ def load_pruna_model(model_path: str, **kwargs) -> tuple[Any, SmashConfig]:
     if smash_config.load_fn is None:
         raise ValueError("Load function has not been set.")
 
+    if (
+        smash_config.load_fn == LOAD_FUNCTIONS.pickled.name
+        and not {"map_location", "device_map", "device"} & kwargs.keys()
+        and (not str(smash_config.device).startswith("cuda") or torch.cuda.is_available())
+    ):
+        # place each storage on the device as it is unpickled from the memory-mapped file,
+        # so the full model never has to be staged on cpu before moving it to the device
+        kwargs["map_location"] = smash_config.device
+
     model = LOAD_FUNCTIONS[smash_config.load_fn](model_path, **kwargs)
 
     try:
@@ -204,7 +210,8 @@ def resmash(model: Any, smash_config: SmashConfig) -> Any:
         The resmashed model.
     """
     # determine algorithms to reapply
-    smash_config_subset = deepcopy(smash_config)
+    # a shallow copy shares the tokenizer, processor and data instead of duplicating them
+    smash_config_subset = copy(smash_config)
     for algorithm_group, algorithm in smash_config.reapply_after_load.items():
         # hyperparameters for algorithms were copied or discarded upon setting to None
         smash_config_subset[algorithm_group] = algorithm
@@ -234,16 +241,22 @@ def load_transformers_model(path: str, **kwargs) -> Any:
     AutoModel | pipeline
         The loaded model or pipeline.
     """
+    import transformers
+    from transformers import pipeline
+    from transformers.utils import is_accelerate_available
+
     if os.path.exists(os.path.join(path, PIPELINE_INFO_FILE_NAME)):
-        with open(os.path.join(path, PIPELINE_INFO_FILE_NAME), "r") as f:
-            pipeline_info = json.load(f)
+        pipeline_info = load_json_config(path, PIPELINE_INFO_FILE_NAME)
         # transformers discards kwargs automatically, no need for filtering
         return pipeline(pipeline_info["task"], path, **kwargs)
     else:
-        with open(os.path.join(path, "config.json"), "r") as f:
-            config = json.load(f)
+        config = load_json_config(path, "config.json")
         architecture = config["architectures"][0]
         cls = getattr(transformers, architecture)
+        # build the model on the meta device and load the weights into it directly,
+        # instead of initializing all weights first and then overwriting them
+        if is_accelerate_available():
+            kwargs.setdefault("low_cpu_mem_usage", True)
         # transformers discards kwargs automatically, no need for filtering
         return cls.from_pretrained(path, **kwargs)
 
@@ -264,6 +277,8 @@ def load_diffusers_model(path: str, **kwargs) -> Any:
     Any
         The loaded diffusers model.
     """
+    import diffusers
+
     # if it is a diffusers model, it saves the model_index.json file
     model_index = load_json_config(path, "model_index.json")
 
@@ -288,9 +303,20 @@ def load_pickled(path: str, **kwargs) -> Any:
     Any
         The loaded pickled model.
     """
-    return torch.load(
-        os.path.join(path, PICKLED_FILE_NAME), **filter_load_kwargs(torch.load, kwargs)
-    )
+    load_kwargs = filter_load_kwargs(torch.load, kwargs)
+    # memory-map the tensor storages instead of reading the whole file into memory,
+    # they are paged in on first use and copy-on-write, so the file is never modified,
+    # save_pickled replaces the file instead of overwriting it, so saving to the same path keeps these pages valid
+    load_kwargs.setdefault("mmap", True)
+    model_path = os.path.join(path, PICKLED_FILE_NAME)
+    if "weights_only" in load_kwargs:
+        return torch.load(model_path, **load_kwargs)
+    try:
+        # the restricted unpickler fails on the first unknown class, before any storage is read
+        return torch.load(model_path, weights_only=True, **load_kwargs)
+    except pickle.UnpicklingError:
+        pruna_logger.debug("Pickled model contains custom classes, loading it without weights_only.")
+        return torch.load(model_path, weights_only=False, **load_kwargs)
 
 
 def load_hqq(model_path: str, **kwargs) -> Any:
@@ -357,12 +383,22 @@ def load_quantized(model_path: str, **kwargs) -> Any:
         )
         raise
 
-    model = AutoAWQForCausalLM.from_quantized(
-        model_path, **filter_load_kwargs(AutoAWQForCausalLM.from_quantized, kwargs)
-    )
+    try:
+        model = AutoAWQForCausalLM.from_quantized(
+            model_path, **filter_load_kwargs(AutoAWQForCausalLM.from_quantized, kwargs)
+        )
+    except Exception as e:
+        if kwargs.get("fuse_layers") is False:
+            raise
+        # not every architecture can be fused, keep the unfused layers instead of failing the load
+        pruna_logger.warning(f"Loading the AWQ model with fused layers failed, loading it without fusion: {e}")
+        kwargs["fuse_layers"] = False
+        model = AutoAWQForCausalLM.from_quantized(
+            model_path, **filter_load_kwargs(AutoAWQForCausalLM.from_quantized, kwargs)
+        )
 
     # fused rotational embeddings introduce complex tensors that can not be saved afterwards
-    if any(param.dtype.is_complex for param in model.parameters()):
+    if any(param.is_complex() for _, param in model.named_parameters()):
         # free memory from previously loaded model
         del model
 
@@ -391,6 +427,8 @@ def load_hqq_diffusers(path: str, **kwargs) -> Any:
     Any
         The loaded diffusers model.
     """
+    import diffusers
+
     from pruna.algorithms.quantization.hqq_diffusers import (
         HQQDiffusersQuantizer,
         construct_base_class,
@@ -402,30 +440,26 @@ def load_hqq_diffusers(path: str, **kwargs) -> Any:
     )
 
     # if it is a diffusers model, it saves the model_index.json file
-    if not os.path.exists(os.path.join(path, "model_index.json")):
-        model = AutoHQQHFDiffusersModel.from_quantized(
-            path, **filter_load_kwargs(AutoHQQHFDiffusersModel.from_quantized, kwargs)
-        )
+    if os.path.exists(os.path.join(path, "model_index.json")):
         # Get the pipeline class name
         model_index = load_json_config(path, "model_index.json")
         cls = getattr(diffusers, model_index["_class_name"])
-        # we need to load the original model pipeline, and
-        # then replace the unet/transformer with the one from model_path.
-        loaded_transformer = AutoHQQHFDiffusersModel.from_quantized(
-            path + "/transformer_quantized"
-        )
-        if "transformer" in model_index:
-            model = cls.from_pretrained(path, transformer=loaded_backbone, **kwargs)
-        # If the pipeline has a unet, load the unet
-        elif "unet" in model_index:
-            model = cls.from_pretrained(path, unet=loaded_backbone, **kwargs)
-            # If the unet has up_blocks, we need to change the upsampler name to conv
+        backbone_name = "transformer" if "transformer" in model_index else "unet"
+        # the quantized backbone and the rest of the pipeline are stored separately, they are loaded one after the
+        # other since the backbone is created under init_empty_weights, which patches module creation process-wide
+        backbone = AutoHQQHFDiffusersModel.from_quantized(os.path.join(path, f"{backbone_name}_quantized"))
+        model = cls.from_pretrained(path, **{backbone_name: None}, **kwargs)
+        setattr(model, backbone_name, backbone)
+        # If the unet has up_blocks, we need to change the upsampler name to conv
+        if backbone_name == "unet":
             for layer in model.unet.up_blocks:
                 if layer.upsamplers is not None:
                     layer.upsamplers[0].name = "conv"
     else:
         # load the whole model if a pipeline wasn't saved
-        model = auto_hqq_hf_diffusers_model.from_quantized(path, **kwargs)
+        model = AutoHQQHFDiffusersModel.from_quantized(
+            path, **filter_load_kwargs(AutoHQQHFDiffusersModel.from_quantized, kwargs)
+        )
     return model
 
 
@@ -486,6 +520,24 @@ class LOAD_FUNCTIONS(Enum):  # noqa: N801
         return None
 
 
+@lru_cache(maxsize=None)
+def _valid_params(func: Callable) -> frozenset[str]:
+    """
+    Get the names of the parameters of the given function, cached per function.
+
+    Parameters
+    ----------
+    func : Callable
+        The function to inspect.
+
+    Returns
+    -------
+    frozenset[str]
+        The names of the parameters of the function.
+    """
+    return frozenset(inspect.signature(func).parameters.keys())
+
+
 def filter_load_kwargs(func: Callable, kwargs: dict) -> dict:
     """
     Filter out keyword arguments that cannot be passed to the given function.
@@ -502,9 +554,7 @@ def filter_load_kwargs(func: Callable, kwargs: dict) -> dict:
     dict
         The filtered keyword arguments.
     """
-    # Get the function's signature
-    signature = inspect.signature(func)
-    valid_params = set(signature.parameters.keys())
+    valid_params = _valid_params(func)
 
     # Filter valid and invalid kwargs
     valid_kwargs = {k: v for k, v in kwargs.items() if k in valid_params}
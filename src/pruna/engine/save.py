@@ -263,7 +263,16 @@ def save_pickled(model: Any, model_path: str, smash_config: SmashConfig) -> None
     smash_helpers = get_helpers(model)
     for helper in smash_helpers:
         getattr(model, helper).disable()
-    torch.save(model, os.path.join(model_path, PICKLED_FILE_NAME))
+    # write to a new file and move it into place, a model loaded from the previous file with mmap keeps reading
+    # the old pages instead of a file that is truncated under it
+    fd, temp_path = tempfile.mkstemp(prefix=f".{PICKLED_FILE_NAME}.", dir=model_path)
+    os.close(fd)
+    try:
+        torch.save(model, temp_path)
+        os.replace(temp_path, os.path.join(model_path, PICKLED_FILE_NAME))
+    except BaseException:
+        os.remove(temp_path)
+        raise
     smash_config.load_fn = LOAD_FUNCTIONS.pickled.name
 
 
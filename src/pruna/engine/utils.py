@@ -16,6 +16,8 @@ import gc
 import inspect
 import json
 import os
+from copy import deepcopy
+from functools import lru_cache
 from typing import Any
 
 import torch
@@ -23,12 +25,50 @@ import torch
 from pruna.logging.logger import pruna_logger
 
 
-def safe_memory_cleanup() -> None:
-    """Perform safe memory cleanup by collecting garbage and clearing CUDA cache."""
-    gc.collect()
+def safe_memory_cleanup(collect_garbage: bool = False) -> None:
+    """
+    Perform safe memory cleanup by clearing the CUDA cache, optionally collecting garbage first.
+
+    Parameters
+    ----------
+    collect_garbage : bool
+        Whether to run a full garbage collection first, which only frees memory held by reference cycles.
+        It is slow and only needed before measuring memory, it can be forced with the PRUNA_FORCE_GC env variable.
+    """
+    if collect_garbage or os.environ.get("PRUNA_FORCE_GC"):
+        gc.collect()
     torch.cuda.empty_cache()
 
 
+def needs_cpu_offload(model: Any, device: str | torch.device, margin: float = 1.5) -> bool:
+    """
+    Check whether the model has to be moved to CPU to leave room for a smashed copy on the device.
+
+    Parameters
+    ----------
+    model : Any
+        The model to check.
+    device : str | torch.device
+        The device the smashed model will be placed on.
+    margin : float
+        The free memory required on the device, as a multiple of the model size.
+
+    Returns
+    -------
+    bool
+        True if the free memory on the device is not sufficient to keep the model on it, False otherwise.
+    """
+    if not torch.cuda.is_available() or torch.device(device).type != "cuda":
+        return True
+    model_size = sum(
+        param.numel() * param.element_size()
+        for module in get_nn_modules(model).values()
+        for param in module.parameters()
+    )
+    free_memory, _ = torch.cuda.mem_get_info(torch.device(device))
+    return free_memory < margin * model_size
+
+
 def load_json_config(path: str, json_name: str) -> dict:
     """
     Load and parse a JSON configuration file.
@@ -45,9 +85,35 @@ def load_json_config(path: str, json_name: str) -> dict:
     dict
         Parsed JSON configuration as a dictionary.
     """
-    with open(os.path.join(path, json_name), "r") as f:
-        model_index = json.load(f)
-    return model_index
+    config_path = os.path.join(path, json_name)
+    # the modification time and size are part of the cache key so a rewritten file is parsed again
+    stat = os.stat(config_path)
+    # callers get their own copy so they cannot alter the cached config
+    return deepcopy(_load_json_config_cached(config_path, stat.st_mtime_ns, stat.st_size))
+
+
+@lru_cache(maxsize=32)
+def _load_json_config_cached(config_path: str, mtime_ns: int, size: int) -> dict:
+    """
+    Load and parse a JSON configuration file, cached per file version.
+
+    Parameters
+    ----------
+    config_path : str
+        Path of the JSON file to load.
+    mtime_ns : int
+        Modification time of the file in nanoseconds, only used as part of the cache key.
+    size : int
+        Size of the file in bytes, only used as part of the cache key.
+
+    Returns
+    -------
+    dict
+        Parsed JSON configuration as a dictionary.
+    """
+    # json.loads detects the encoding of bytes itself, which skips the text decoding layer of the file object
+    with open(config_path, "rb") as f:
+        return json.loads(f.read())
 
 
 def get_nn_modules(model: Any) -> dict[str | None, torch.nn.Module]:
@@ -70,12 +136,19 @@ def get_nn_modules(model: Any) -> dict[str | None, torch.nn.Module]:
     """
     if isinstance(model, torch.nn.Module):
         return {None: model}
+    # inspect.getmembers calls getattr on every attribute, which can trigger expensive properties, so we first look
+    # at the component registry of diffusers pipelines or the instance attributes
+    components = getattr(model, "components", None)
+    if isinstance(components, dict):
+        members = components.items()
     else:
-        return {
-            module_name: module
-            for module_name, module in inspect.getmembers(model)
-            if isinstance(module, torch.nn.Module)
-        }
+        members = vars(model).items() if hasattr(model, "__dict__") else ()
+    nn_modules = {module_name: module for module_name, module in members if isinstance(module, torch.nn.Module)}
+    if nn_modules:
+        return nn_modules
+    return {
+        module_name: module for module_name, module in inspect.getmembers(model) if isinstance(module, torch.nn.Module)
+    }
 
 
 def move_to_device(model: Any, device: str | torch.device, raise_error: bool = False) -> None:
@@ -12,10 +12,14 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from typing import Any, Dict, List
+import os
+import shutil
+import tempfile
+import weakref
+from typing import Any, Callable, Dict, Iterator, List, Tuple
 
 import torch
-from torch import Tensor
+from torch.utils._pytree import tree_leaves
 
 from pruna.config.utils import is_empty_config
 from pruna.engine.pruna_model import PrunaModel
@@ -40,7 +44,11 @@ class EvaluationAgent:
         self.first_model_results: Dict[str, Any] = {}
         self.subsequent_model_results: Dict[str, Any] = {}
         self.device = self.task.device
-        self.cache: List[Tensor] = []
+        # pairwise outputs of the first model are spilled to disk and memory-mapped back batch by batch
+        self.cache_path = tempfile.mkdtemp(prefix="pruna_evaluation_cache_")
+        self._finalizer = weakref.finalize(self, shutil.rmtree, self.cache_path, ignore_errors=True)
+        # reused pinned host buffers to copy the outputs to before they are written to the cache
+        self._pinned_buffers: Dict[Tuple[torch.Size, torch.dtype], torch.Tensor] = {}
         self.evaluation_for_first_model: bool = True
 
     def evaluate(self, model: Any) -> Dict[str, Any]:
@@ -81,6 +89,7 @@ class EvaluationAgent:
         if self.evaluation_for_first_model:
             self.first_model_results = results
             self.evaluation_for_first_model = False
+            self._pinned_buffers.clear()
             if self.task.is_pairwise_evaluation():
                 pruna_logger.info(
                     "The cache has been populated with the current model.\n"
@@ -89,9 +98,12 @@ class EvaluationAgent:
         else:
             self.subsequent_model_results = results
 
-        for key, value in results.items():
-            if isinstance(value, torch.Tensor):
-                results[key] = value.item()
+        # queue all device-to-host copies and synchronize once, instead of a blocking sync on every .item()
+        tensor_results = {key: value.detach() for key, value in results.items() if isinstance(value, torch.Tensor)}
+        host_results = {key: value.to("cpu", non_blocking=True) for key, value in tensor_results.items()}
+        if any(value.is_cuda for value in tensor_results.values()):
+            torch.cuda.synchronize()
+        results.update({key: value.item() for key, value in host_results.items()})
         return results
 
     def prepare_model(self, model: Any) -> PrunaModel:
@@ -152,22 +164,51 @@ class EvaluationAgent:
         if not single_stateful_metrics and not pairwise_metrics:
             return
 
+        single_updates = [stateful_metric.get_update_fn() for stateful_metric in single_stateful_metrics]
+        pairwise_updates = [pairwise_metric.get_update_fn() for pairwise_metric in pairwise_metrics]
+
         model.move_to_device(self.device)
-        for batch_idx, batch in enumerate(self.task.dataloader):
-            processed_outputs = model.run_inference(batch, self.device)
+        batches = _prefetch_batches(self.task.dataloader, self.device, model.inference_handler.move_inputs_to_device)
+        for batch_idx, (batch, device_batch) in enumerate(batches):
+            processed_outputs = model.run_inference(device_batch, self.device)
 
             (x, gt) = batch
             # Non-pairwise (aka single) metrics have regular update.
-            for stateful_metric in single_stateful_metrics:
-                stateful_metric.update(x, gt, processed_outputs)
+            for update in single_updates:
+                update(x, gt, processed_outputs)
 
             # Cache outputs once in the agent for pairwise metrics to save compute time and memory.
             if self.task.is_pairwise_evaluation():
+                cached_batch_path = os.path.join(self.cache_path, f"{batch_idx}.pt")
                 if self.evaluation_for_first_model:
-                    self.cache.append(processed_outputs)
+                    torch.save(self._to_pinned_host(processed_outputs), cached_batch_path)
                 else:
-                    for pairwise_metric in pairwise_metrics:
-                        pairwise_metric.update(x, self.cache[batch_idx], processed_outputs)
+                    cached_outputs = torch.load(cached_batch_path, mmap=True, map_location=self.device)
+                    for update in pairwise_updates:
+                        update(x, cached_outputs, processed_outputs)
+
+    def _to_pinned_host(self, outputs: Any) -> Any:
+        """
+        Copy CUDA outputs into a reused pinned host buffer of the same shape and dtype.
+
+        Allocating pinned memory is expensive, so one buffer per output shape is kept for the whole first evaluation.
+
+        Parameters
+        ----------
+        outputs : Any
+            The processed outputs of the model.
+
+        Returns
+        -------
+        Any
+            The outputs on the host, or the outputs themselves if they are not a CUDA tensor.
+        """
+        if not isinstance(outputs, torch.Tensor) or not outputs.is_cuda:
+            return outputs
+        key = (outputs.shape, outputs.dtype)
+        if key not in self._pinned_buffers:
+            self._pinned_buffers[key] = torch.empty(outputs.shape, dtype=outputs.dtype, pin_memory=True)
+        return self._pinned_buffers[key].copy_(outputs)
 
     def compute_stateful_metrics(
         self, single_stateful_metrics: List[StatefulMetric], pairwise_metrics: List[StatefulMetric]
@@ -214,7 +255,167 @@ class EvaluationAgent:
         Dict[str, Any]
             The results of the stateless metrics.
         """
-        results = {}
+        results: Dict[str, Any] = {}
+        if not stateless_metrics:
+            return results
+        # the metrics measure inference in isolation and each iterate the data themselves,
+        # the batches are loaded once and replayed to all of them instead of decoding the dataset for every metric,
+        # they stay in host memory for the duration of this pass, evaluation sets that do not fit have to be subsampled
+        dataloader = _ReplayDataLoader(self.task.dataloader)
         for stateless_metric in stateless_metrics:
-            results.update(stateless_metric.compute(model, self.task.dataloader))
+            results.update(stateless_metric.compute(model, dataloader))
         return results
+
+
+class _ReplayDataLoader:
+    """
+    Wrap a dataloader so its batches are loaded once and replayed on every later iteration.
+
+    Batches are recorded lazily, an iteration that stops early only loads the batches it used.
+    The recorded batches are kept in host memory until the wrapper is dropped at the end of the stateless metric pass,
+    so memory use grows with the part of the evaluation set the metrics iterate over.
+    Other attributes, such as the batch size, are forwarded to the wrapped dataloader.
+
+    Parameters
+    ----------
+    dataloader : Any
+        The dataloader to wrap.
+    """
+
+    def __init__(self, dataloader: Any) -> None:
+        self.dataloader = dataloader
+        self._batches: List[Any] = []
+        self._iterator: Iterator[Any] | None = None
+        self._exhausted = False
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate over the recorded batches, loading the missing ones from the wrapped dataloader.
+
+        Yields
+        ------
+        Any
+            The batches of the dataloader.
+        """
+        batch_idx = 0
+        while True:
+            if batch_idx < len(self._batches):
+                yield self._batches[batch_idx]
+                batch_idx += 1
+                continue
+            if self._exhausted:
+                return
+            if self._iterator is None:
+                self._iterator = iter(self.dataloader)
+            try:
+                self._batches.append(next(self._iterator))
+            except StopIteration:
+                self._exhausted = True
+                self._iterator = None
+                return
+
+    def __len__(self) -> int:
+        """
+        Get the number of batches of the wrapped dataloader.
+
+        Returns
+        -------
+        int
+            The number of batches.
+        """
+        return len(self.dataloader)
+
+    def __getattr__(self, attr: str) -> Any:
+        """
+        Forward attribute access to the wrapped dataloader.
+
+        Parameters
+        ----------
+        attr : str
+            The attribute to access.
+
+        Returns
+        -------
+        Any
+            The attribute of the wrapped dataloader.
+        """
+        # private and dunder lookups (e.g. from hasattr checks or copy) are not forwarded to the wrapped dataloader
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        return getattr(self.dataloader, attr)
+
+
+def _prefetch_batches(
+    dataloader: Any, device: torch.device | str, move_inputs_to_device: Callable[..., Any]
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Iterate over a dataloader while copying the next batch to the device on a side CUDA stream.
+
+    The copy of the next batch is queued before the current batch is handed out, so host-to-device transfers overlap
+    with inference. On other devices, batches are returned as they are and moved by the inference handler.
+
+    Parameters
+    ----------
+    dataloader : Any
+        The dataloader to iterate over.
+    device : torch.device | str
+        The device to copy the batches to.
+    move_inputs_to_device : Callable[..., Any]
+        The function of the inference handler that moves a batch to the device.
+
+    Yields
+    ------
+    Tuple[Any, Any]
+        The batch as returned by the dataloader and its copy on the device.
+    """
+    if torch.device(device).type != "cuda" or not torch.cuda.is_available():
+        for batch in dataloader:
+            yield batch, batch
+        return
+
+    if not getattr(dataloader, "pin_memory", False) or getattr(dataloader, "num_workers", 0) < 2:
+        pruna_logger.debug(
+            "The evaluation dataloader does not use pinned memory and at least two workers, "
+            "host-to-device copies will not fully overlap with inference."
+        )
+
+    copy_stream = torch.cuda.Stream(device=device)
+
+    def _copy(batch: Any) -> Tuple[Any, Any, torch.cuda.Event]:
+        with torch.cuda.stream(copy_stream):
+            device_batch = move_inputs_to_device(batch, device)
+            copied = torch.cuda.Event()
+            copied.record(copy_stream)
+        return batch, device_batch, copied
+
+    def _ready(pending: Tuple[Any, Any, torch.cuda.Event]) -> Tuple[Any, Any]:
+        batch, device_batch, copied = pending
+        compute_stream = torch.cuda.current_stream(device)
+        compute_stream.wait_event(copied)
+        _record_stream(device_batch, compute_stream)
+        return batch, device_batch
+
+    pending = None
+    for batch in dataloader:
+        copied_batch = _copy(batch)
+        if pending is not None:
+            yield _ready(pending)
+        pending = copied_batch
+    if pending is not None:
+        yield _ready(pending)
+
+
+def _record_stream(inputs: Any, stream: torch.cuda.Stream) -> None:
+    """
+    Mark the CUDA tensors of a batch as used by a stream so their memory is not reused too early.
+
+    Parameters
+    ----------
+    inputs : Any
+        The batch, tensors nested in tuples, lists and dicts are marked as well.
+    stream : torch.cuda.Stream
+        The stream that uses the tensors.
+    """
+    for leaf in tree_leaves(inputs):
+        if isinstance(leaf, torch.Tensor) and leaf.is_cuda:
+            leaf.record_stream(stream)
@@ -136,7 +136,7 @@ class GPUMemoryMetric(BaseMetric):
 
         gpu_manager = GPUManager(self.gpu_indices)
         with gpu_manager.manage_resources():
-            safe_memory_cleanup()
+            safe_memory_cleanup(collect_garbage=True)
             memory_before_load = gpu_manager.get_memory_usage()
 
             # Load and prepare the model
@@ -169,7 +169,7 @@ class GPUMemoryMetric(BaseMetric):
 
             peak_memory = (max(before_sum, load_sum, after_sum, memory_after_model_run_torch) - before_sum) / 1024**2
 
-            safe_memory_cleanup()
+            safe_memory_cleanup(collect_garbage=True)
 
             return {f"{self.mode}_memory": peak_memory}
 
@@ -14,8 +14,9 @@
 
 from abc import abstractmethod
 from copy import deepcopy
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 
+import torch
 from torch import Tensor
 
 from pruna.evaluation.metrics.metric_base import BaseMetric
@@ -30,8 +31,13 @@ class StatefulMetric(BaseMetric):
     across multiple batches or iterations. Unlike simple metrics that compute values
     independently for each input, stateful metrics track running statistics or
     aggregated values over time.
+
+    Setting ``compile_update`` to True compiles the update method with torch.compile the first time it is used
+    during evaluation. This pays off for metrics doing dense tensor math on many small batches.
     """
 
+    compile_update: bool = False
+
     def __init__(self) -> None:
         """Initialize the StatefulMetric class."""
         super().__init__()
@@ -105,6 +111,25 @@ class StatefulMetric(BaseMetric):
             The keyword arguments to pass to the metric.
         """
 
+    def get_update_fn(self) -> Callable[..., None]:
+        """
+        Get the function used to update the metric, compiled once and reused if ``compile_update`` is set.
+
+        Returns
+        -------
+        Callable[..., None]
+            The update method of the metric or its compiled version.
+        """
+        if not self.compile_update:
+            return self.update
+        # not set in __init__, as metrics that also inherit from torchmetrics do not run this class's __init__
+        compiled_update = getattr(self, "_compiled_update", None)
+        if compiled_update is None:
+            # the default mode is used, cuda graphs would reuse output memory across the stateful updates
+            compiled_update = torch.compile(self.update, dynamic=True)
+            self._compiled_update = compiled_update
+        return compiled_update
+
     @abstractmethod
     def compute(self) -> Any:
         """Override this method to compute the final metric value."""
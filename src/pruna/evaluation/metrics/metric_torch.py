@@ -147,6 +147,10 @@ class TorchMetrics(Enum):
         return self.tm(**kwargs)
 
 
+# dense pixel metrics run many small tensor operations on every batch, their update is compiled once and reused
+COMPILED_UPDATE_METRICS = ("psnr", "ssim", "lpips")
+
+
 @MetricRegistry.register_wrapper(available_metrics=TorchMetrics.__members__.keys())
 class TorchMetricWrapper(StatefulMetric):
     """
@@ -211,6 +215,7 @@ class TorchMetricWrapper(StatefulMetric):
 
         pruna_logger.info(f"Using call_type: {self.call_type} for metric {metric_name}")
         self.metric_name = metric_name
+        self.compile_update = metric_name in COMPILED_UPDATE_METRICS
 
     def update(self, x: List[Any] | Tensor, gt: List[Any] | Tensor, outputs: Any) -> None:
         """
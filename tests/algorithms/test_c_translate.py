@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+import torch
+from transformers import OPTConfig, OPTForCausalLM
+
+from pruna.algorithms.compilation.c_translate import _conversion_key, _ids_to_tokens
+
+
+def _tiny_opt() -> OPTForCausalLM:
+    """Build a tiny randomly initialized OPT model."""
+    config = OPTConfig(
+        vocab_size=32,
+        hidden_size=8,
+        num_hidden_layers=1,
+        ffn_dim=16,
+        num_attention_heads=2,
+        max_position_embeddings=16,
+        word_embed_proj_dim=8,
+    )
+    return OPTForCausalLM(config)
+
+
+@pytest.mark.cpu
+def test_conversion_key_changes_with_weights() -> None:
+    """Test that a model with the same config but different weights gets a different conversion key."""
+    model = _tiny_opt()
+    key = _conversion_key(model, "generate", 8, "cpu")
+    assert _conversion_key(model, "generate", 8, "cpu") == key
+
+    with torch.no_grad():
+        next(model.parameters()).add_(1.0)
+    assert _conversion_key(model, "generate", 8, "cpu") != key
+
+
+@pytest.mark.cpu
+def test_conversion_key_changes_with_configuration() -> None:
+    """Test that the conversion key depends on the compilation configuration."""
+    model = _tiny_opt()
+    key = _conversion_key(model, "generate", 8, "cpu")
+    assert _conversion_key(model, "generate", 16, "cpu") != key
+    assert _conversion_key(model, "generate", 8, "cuda") != key
+
+
+@pytest.mark.cpu
+def test_ids_to_tokens_padded_and_ragged() -> None:
+    """Test that padded tensors and unpadded nested lists of token ids are both converted."""
+    id_to_token = np.array(["a", "b", "c"], dtype=object)
+    assert _ids_to_tokens(id_to_token, torch.tensor([[0, 1], [2, 0]])) == [["a", "b"], ["c", "a"]]
+    assert _ids_to_tokens(id_to_token, [[0, 1, 2], [1]]) == [["a", "b", "c"], ["b"]]
+
+
+@pytest.mark.cpu
+@pytest.mark.parametrize("ids", [[[0, -1]], [[3]], [[0, 1], [5]]])
+def test_ids_to_tokens_rejects_ids_outside_vocabulary(ids: list[list[int]]) -> None:
+    """Test that token ids outside of the vocabulary are rejected instead of wrapping around."""
+    id_to_token = np.array(["a", "b", "c"], dtype=object)
+    with pytest.raises(ValueError):
+        _ids_to_tokens(id_to_token, ids)
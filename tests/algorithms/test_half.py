@@ -0,0 +1,77 @@
+from typing import Any
+
+import pytest
+import torch
+
+from pruna import SmashConfig
+from pruna.algorithms.quantization.half import HalfQuantizer
+from pruna.config.smash_config import SmashConfigPrefixWrapper
+
+
+class _InputRecorder(torch.nn.Module):
+    """Linear model that records the inputs of its forward pass."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.linear = torch.nn.Linear(4, 4)
+        self.inputs: list[Any] = []
+
+    def forward(self, x: torch.Tensor, mask: dict[str, torch.Tensor] | None = None) -> torch.Tensor:
+        """Record the inputs and apply the linear layer."""
+        self.inputs.append((x, mask))
+        return self.linear(x)
+
+
+def _apply_half(model: torch.nn.Module, **hyperparameters: Any) -> torch.nn.Module:
+    """Apply the half quantizer on the CPU with the given hyperparameters."""
+    smash_config = SmashConfig(device="cpu")
+    smash_config["quantizer"] = "half"
+    for key, value in hyperparameters.items():
+        smash_config[f"half_{key}"] = value
+    return HalfQuantizer()._apply(model, SmashConfigPrefixWrapper(smash_config, "half_"))
+
+
+@pytest.mark.cpu
+def test_conv_model_is_channels_last() -> None:
+    """Test that convolutional models and their image inputs are moved to channels_last once."""
+    model = _apply_half(torch.nn.Sequential(torch.nn.Conv2d(3, 4, 3)))
+    assert model[0].weight.is_contiguous(memory_format=torch.channels_last)
+    assert model(torch.randn(1, 3, 8, 8)).dtype == torch.float16
+
+
+@pytest.mark.cpu
+def test_nested_4d_inputs_keep_their_layout() -> None:
+    """Test that 4D tensors of models without convolutions are only cast, not moved to channels_last."""
+    model = _apply_half(_InputRecorder())
+    model(torch.randn(2, 4), mask={"attention_mask": torch.randn(2, 1, 4, 4)})
+    x, mask = model.inputs[-1]
+    assert x.dtype == torch.float16
+    assert mask["attention_mask"].dtype == torch.float16
+    assert mask["attention_mask"].is_contiguous()
+
+
+@pytest.mark.cpu
+def test_compile_falls_back_to_eager_on_first_call(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a forward pass that fails to compile on its first call runs eagerly instead."""
+
+    def failing_compile(forward: Any, **kwargs: Any) -> Any:
+        def compiled_forward(*args: Any, **kwargs: Any) -> Any:
+            raise RuntimeError("compilation failed")
+
+        return compiled_forward
+
+    monkeypatch.setattr(torch, "compile", failing_compile)
+    model = _apply_half(torch.nn.Linear(4, 4), compile=True)
+    assert model(torch.randn(2, 4)).dtype == torch.float16
+    assert model(torch.randn(2, 4)).dtype == torch.float16
+
+
+@pytest.mark.cpu
+@pytest.mark.parametrize("dtype, torch_dtype", [("fp16", torch.float16), ("bf16", torch.bfloat16)])
+def test_dtype_hyperparameter(dtype: str, torch_dtype: torch.dtype) -> None:
+    """Test that the weights, inputs and outputs use the selected half precision data type."""
+    model = _apply_half(_InputRecorder(), dtype=dtype)
+    output = model(torch.randn(2, 4))
+    assert model.linear.weight.dtype == torch_dtype
+    assert model.inputs[-1][0].dtype == torch_dtype
+    assert output.dtype == torch_dtype
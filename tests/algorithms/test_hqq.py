@@ -0,0 +1,19 @@
+import pytest
+import torch
+
+from pruna.algorithms.quantization.hqq import HQQQuantizer, _patch_fused_hqq_linear
+
+
+@pytest.mark.cuda
+def test_fused_backend_matches_hqq_forward() -> None:
+    """Test that the fused torchao kernel computes the same output as the HQQ dequantize and matmul."""
+    imported_modules = HQQQuantizer().import_algorithm_packages()
+    quant_config = imported_modules["BaseQuantizeConfig"](nbits=4, group_size=64, axis=1)
+    layer = imported_modules["HQQLinear"](
+        torch.nn.Linear(256, 128), quant_config, compute_dtype=torch.float16, device="cuda"
+    )
+    x = torch.randn(2, 3, 256, dtype=torch.float16, device="cuda")
+    expected = layer(x)
+
+    _patch_fused_hqq_linear(layer, imported_modules["HQQLinear"])
+    torch.testing.assert_close(layer(x), expected, atol=1e-2, rtol=1e-2)
@@ -1,20 +1,33 @@
+import gc
 import os
 import shutil
+import tempfile
 from abc import abstractmethod
+from functools import lru_cache
 from typing import Any
 
 import torch
-from diffusers import SanaPipeline
 
 from pruna import PrunaModel, SmashConfig, smash
 from pruna.algorithms.pruna_base import PrunaAlgorithmBase
+from pruna.config.smash_config import SMASH_CONFIG_FILE_NAME
 from pruna.engine.utils import safe_memory_cleanup
 
+# models that are stored in float16 and have to be loaded in float16 again after saving
+HALF_PRECISION_MODELS = frozenset({"sana"})
+
 
 class AlgorithmTesterBase:
     """Base class for testing algorithms."""
 
-    saving_path: str = "saved_model/"
+    _saving_path: str | None = None
+
+    @property
+    def saving_path(self) -> str:
+        """A temporary directory to save the model to, unique to this tester so tests can run in parallel."""
+        if self._saving_path is None:
+            self._saving_path = tempfile.mkdtemp(prefix=f"pruna_{type(self).__name__}_")
+        return self._saving_path
 
     @property
     @abstractmethod
@@ -43,52 +56,62 @@ class AlgorithmTesterBase:
     @classmethod
     def cast_to_device(cls, model: Any, device: str = "cpu") -> Any:
         """Cast the model to the given device."""
-        if hasattr(model, "to"):
-            model.to(device)
-        elif hasattr(model, "model"):
-            model.model.to(device)
+        to = getattr(model, "to", None)
+        if to is not None:
+            to(device)
+        else:
+            inner_model = getattr(model, "model", None)
+            if inner_model is not None:
+                inner_model.to(device)
         return model
 
-    @classmethod
-    def final_teardown(cls, smash_config: SmashConfig) -> None:
+    def final_teardown(self, smash_config: SmashConfig) -> None:
         """Teardown the test, remove the saved model and clean up the files in any case."""
         # reset this smash config cache dir, this should not be shared across runs
         smash_config.cleanup_cache_dir()
 
-        # remove the saved model
-        model_path = "saved_model/"
-        if os.path.exists(model_path):
-            shutil.rmtree(model_path)
-
-        # clean up the leftovers
-        safe_memory_cleanup()
+        # remove the saved model, the next run of this tester gets a fresh directory
+        # the path is only created once a test saves, so skipped tests do not touch the filesystem
+        if self._saving_path is not None:
+            try:
+                # the directory is empty if the test failed before saving
+                os.rmdir(self._saving_path)
+            except OSError:
+                shutil.rmtree(self._saving_path, ignore_errors=True)
+            self._saving_path = None
+
+        # clean up the leftovers, a full garbage collection is only worth it to release CUDA memory
+        if str(smash_config["device"]).startswith("cuda") or torch.cuda.is_initialized():
+            safe_memory_cleanup(collect_garbage=True)
+        else:
+            gc.collect(0)
 
     @classmethod
-    def check_loading_dtype(cls, model: Any) -> dict[str, Any]:
-        """Check the loading dtype for the model."""
+    def check_loading_dtype(cls) -> dict[str, Any]:
+        """Check the loading dtype for the tested models, known half precision models are loaded in float16."""
         load_kwargs = {}
-        if isinstance(model, SanaPipeline) and not cls.allow_pickle_files:
+        model_names = {model.removeprefix("noref_") for model in cls.models}
+        if not model_names.isdisjoint(HALF_PRECISION_MODELS) and not cls.allow_pickle_files:
             load_kwargs["torch_dtype"] = torch.float16
         return load_kwargs
 
-    @classmethod
-    def execute_save(cls, smashed_model: PrunaModel) -> None:
+    def execute_save(self, smashed_model: PrunaModel) -> None:
         """Save the smashed model."""
-        smashed_model.save_pretrained(cls.saving_path)
-        assert len(os.listdir(cls.saving_path)) > 0
-        if cls.allow_pickle_files:
-            cls.assert_no_pickle_files()
+        smashed_model.save_pretrained(self.saving_path)
+        # the smash config is always written last, so its presence shows the save went through
+        assert os.path.exists(os.path.join(self.saving_path, SMASH_CONFIG_FILE_NAME))
+        if not self.allow_pickle_files:
+            self.assert_no_pickle_files()
 
-    @classmethod
-    def assert_no_pickle_files(cls) -> None:
-        """Check for pickle files in the saving path if pickle files are not expected."""
-        for file in os.listdir(cls.saving_path):
-            assert not file.endswith(".pkl"), "Pickle files found in directory"
+    def assert_no_pickle_files(self) -> None:
+        """Check for pickle files in the saving path if they are not expected."""
+        pickle_file = next((file for file in os.listdir(self.saving_path) if file.endswith((".pkl", ".pickle"))), None)
+        assert pickle_file is None, f"Pickle file found in directory: {pickle_file}"
 
     @classmethod
     def compatible_devices(cls) -> list[str]:
         """Get the compatible devices for the algorithm."""
-        return cls.algorithm_class.compatible_devices()
+        return list(_compatible_devices(cls.algorithm_class))
 
     @classmethod
     def get_algorithm_name(cls) -> str:
@@ -112,14 +135,17 @@ class AlgorithmTesterBase:
         """Load the smashed model."""
         model = PrunaModel.from_pretrained(self.saving_path, **load_kwargs)
         assert isinstance(model, PrunaModel)
-        self.post_smash_hook(model)
+        with torch.inference_mode():
+            self.post_smash_hook(model)
+        return model
 
     def execute_smash(self, model: Any, smash_config: SmashConfig) -> PrunaModel:
         """Execute the smash operation."""
         self.pre_smash_hook(model)
         smashed_model = smash(model, smash_config=smash_config)
         assert isinstance(smashed_model, PrunaModel)
-        self.post_smash_hook(smashed_model)
+        with torch.inference_mode():
+            self.post_smash_hook(smashed_model)
         return smashed_model
 
     def prepare_smash_config(self, smash_config: SmashConfig, device: str) -> None:
@@ -127,6 +153,17 @@ class AlgorithmTesterBase:
         smash_config["device"] = device
         smash_config[self.get_algorithm_group()] = self.get_algorithm_name()
 
+        # calibration batches are pinned on the host so their copies to the GPU do not block,
+        # the arguments are replaced and not updated since datamodules can share the same dict
+        if device == "cuda" and smash_config._data is not None:
+            smash_config._data.dataloader_args = {**smash_config._data.dataloader_args, "pin_memory": True}
+
         if hasattr(self, "hyperparameters"):
             for key, value in self.hyperparameters.items():
                 smash_config[key] = value
+
+
+@lru_cache(maxsize=None)
+def _compatible_devices(algorithm_class: type[PrunaAlgorithmBase]) -> tuple[str, ...]:
+    """Get the compatible devices of an algorithm class once per test session."""
+    return tuple(algorithm_class.compatible_devices())
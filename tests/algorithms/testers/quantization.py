@@ -1,5 +1,7 @@
 import pytest
+import torch
 
+from pruna import PrunaModel
 from pruna.algorithms.quantization.half import HalfQuantizer
 from pruna.algorithms.quantization.hqq import HQQQuantizer
 from pruna.algorithms.quantization.hqq_diffusers import HQQDiffusersQuantizer
@@ -16,6 +18,22 @@ from pruna.algorithms.quantization.torch_static import TorchStaticQuantizer
 from .base_tester import AlgorithmTesterBase
 
 
+class _OptLLMBase(AlgorithmTesterBase):
+    """Shared setup for quantizers tested on a small causal language model."""
+
+    models = ["opt_125m"]
+    reject_models = ["stable_diffusion_v1_4"]
+    allow_pickle_files = False
+
+
+class _SanaBase(AlgorithmTesterBase):
+    """Shared setup for quantizers tested on the Sana diffusion pipeline."""
+
+    models = ["sana"]
+    reject_models = ["opt_125m"]
+    allow_pickle_files = False
+
+
 class TestTorchStatic(AlgorithmTesterBase):
     """Test the torch static quantizer."""
 
@@ -34,32 +52,41 @@ class TestTorchDynamic(AlgorithmTesterBase):
     algorithm_class = TorchDynamicQuantizer
 
 
-class TestQuanto(AlgorithmTesterBase):
+class TestQuanto(_OptLLMBase):
     """Test the Quanto quantizer."""
 
-    models = ["opt_125m"]
     reject_models = ["dummy_lambda"]
-    allow_pickle_files = False
     algorithm_class = QuantoQuantizer
 
 
-class TestLLMint8(AlgorithmTesterBase):
+class TestLLMint8(_OptLLMBase):
     """Test the LLMint8 quantizer."""
 
-    models = ["opt_125m"]
-    reject_models = ["stable_diffusion_v1_4"]
-    allow_pickle_files = False
     algorithm_class = LLMInt8Quantizer
 
 
-class TestDiffusersInt8(AlgorithmTesterBase):
+class TestDiffusersInt8(_SanaBase):
     """Test the DiffusersInt8 quantizer."""
 
-    models = ["sana"]
-    reject_models = ["opt_125m"]
-    allow_pickle_files = False
     algorithm_class = DiffusersInt8Quantizer
 
+    def post_smash_hook(self, model: PrunaModel) -> None:
+        """Hook to verify the quantization config is kept, this also runs on the model loaded from disk."""
+        assert model.transformer.config.get("quantization_config") is not None
+
+
+class TestDiffusersInt8W8A8(_SanaBase):
+    """Test the DiffusersInt8 quantizer with torchao activation quantization."""
+
+    hyperparameters = {"diffusers_int8_quant_type": "w8a8"}
+    allow_pickle_files = True
+    algorithm_class = DiffusersInt8Quantizer
+
+    def post_smash_hook(self, model: PrunaModel) -> None:
+        """Hook to verify the torchao quantized weights are kept, this also runs on the model loaded from disk."""
+        linear_layers = [module for module in model.transformer.modules() if isinstance(module, torch.nn.Linear)]
+        assert not {type(layer.weight) for layer in linear_layers} <= {torch.Tensor, torch.nn.Parameter}
+
 
 class TestHQQ(AlgorithmTesterBase):
     """Test the HQQ quantizer."""
@@ -70,39 +97,27 @@ class TestHQQ(AlgorithmTesterBase):
     algorithm_class = HQQQuantizer
 
 
-class TestHQQDiffusers(AlgorithmTesterBase):
+class TestHQQDiffusers(_SanaBase):
     """Test the HQQ quantizer."""
 
-    models = ["sana"]
-    reject_models = ["opt_125m"]
-    allow_pickle_files = False
     algorithm_class = HQQDiffusersQuantizer
 
 
-class TestHalf(AlgorithmTesterBase):
+class TestHalf(_OptLLMBase):
     """Test the half quantizer."""
 
-    models = ["opt_125m"]
-    reject_models = ["stable_diffusion_v1_4"]
-    allow_pickle_files = False
     algorithm_class = HalfQuantizer
 
 
 @pytest.mark.slow
-class TestGPTQ(AlgorithmTesterBase):
+class TestGPTQ(_OptLLMBase):
     """Test the GPTQ quantizer."""
 
-    models = ["opt_125m"]
-    reject_models = ["stable_diffusion_v1_4"]
-    allow_pickle_files = False
     algorithm_class = GPTQQuantizer
 
 
 @pytest.mark.slow
-class TestAWQ(AlgorithmTesterBase):
+class TestAWQ(_OptLLMBase):
     """Test the AWQ quantizer."""
 
-    models = ["opt_125m"]
-    reject_models = ["stable_diffusion_v1_4"]
-    allow_pickle_files = False
     algorithm_class = AWQQuantizer
@@ -66,7 +66,7 @@ def run_full_integration(algorithm_tester: Any, device: str, model_fixture: tupl
         if device not in algorithm_tester.compatible_devices():
             pytest.skip(f"Algorithm {algorithm_tester.get_algorithm_name()} is not compatible with {device}")
         algorithm_tester.prepare_smash_config(smash_config, device)
-        load_kwargs = algorithm_tester.check_loading_dtype(model)
+        load_kwargs = algorithm_tester.check_loading_dtype()
         model = algorithm_tester.cast_to_device(model, device=smash_config["device"])
         smashed_model = algorithm_tester.execute_smash(model, smash_config)
         algorithm_tester.execute_save(smashed_model)
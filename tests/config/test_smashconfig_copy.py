@@ -0,0 +1,34 @@
+from copy import copy
+
+import pytest
+
+from pruna import SmashConfig
+
+
+@pytest.mark.cpu
+def test_copy_does_not_leak_into_original() -> None:
+    """Test that changes to a copied SmashConfig do not leak into the original."""
+    smash_config = SmashConfig(device="cpu")
+    smash_config["quantizer"] = "hqq"
+    smash_config_copy = copy(smash_config)
+
+    smash_config_copy["quantizer"] = None
+    smash_config_copy.save_fns.append("hqq")
+    smash_config_copy.reapply_after_load["quantizer"] = "hqq"
+
+    assert smash_config["quantizer"] == "hqq"
+    assert smash_config.save_fns == []
+    assert smash_config.reapply_after_load["quantizer"] is None
+    assert smash_config_copy.cache_dir != smash_config.cache_dir
+
+
+@pytest.mark.cpu
+def test_tokenizers_loaded_by_name_are_not_shared() -> None:
+    """Test that changes to a tokenizer loaded by name do not leak into other configs loading the same name."""
+    smash_config = SmashConfig(device="cpu")
+    smash_config.add_tokenizer("bert-base-uncased")
+    other_smash_config = SmashConfig(device="cpu")
+    other_smash_config.add_tokenizer("bert-base-uncased")
+
+    smash_config.tokenizer.padding_side = "left"
+    assert other_smash_config.tokenizer.padding_side == "right"
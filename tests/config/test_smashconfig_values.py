@@ -0,0 +1,18 @@
+import pytest
+
+from pruna import SmashConfig
+from pruna.config.smash_config import convert_numpy_types
+
+
+@pytest.mark.cpu
+def test_native_values_follow_conditional_hyperparameters() -> None:
+    """Test that setting single values keeps the cached values in line with the active hyperparameters."""
+    smash_config = SmashConfig(device="cpu")
+    smash_config["quantizer"] = "hqq"
+    smash_config["hqq_weight_bits"] = 4
+    smash_config["quantizer"] = "half"
+    smash_config["quantizer"] = None
+
+    expected = {k: convert_numpy_types(v) for k, v in dict(smash_config._configuration).items()}
+    assert smash_config._native_values == expected
+    assert "hqq_weight_bits" not in smash_config._native_values
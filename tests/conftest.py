@@ -1,8 +1,22 @@
+import warnings
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any
 
+from huggingface_hub import snapshot_download
+
 # import all fixtures to make them avaliable for pytest
 from .fixtures import *  # noqa: F403, F401
-from .fixtures import HIGH_RESOURCE_FIXTURES, HIGH_RESOURCE_FIXTURES_CPU
+from .fixtures import HIGH_RESOURCE_FIXTURES, HIGH_RESOURCE_FIXTURES_CPU, get_hub_repo_id
+
+
+def pytest_addoption(parser: Any) -> None:
+    """Add the command line options."""
+    parser.addoption(
+        "--prefetch-models",
+        action="store_true",
+        default=False,
+        help="Download the hub models of the selected tests concurrently before running them.",
+    )
 
 
 def pytest_configure(config: Any) -> None:
@@ -25,3 +39,26 @@ def pytest_collection_modifyitems(session: Any, config: Any, items: list) -> Non
                 item.add_marker("high")
             if model_value in HIGH_RESOURCE_FIXTURES_CPU:
                 item.add_marker("high_cpu")
+
+
+def pytest_collection_finish(session: Any) -> None:
+    """Hook that is called after collection and deselection. Prefetches the hub models of the selected tests."""
+    if not session.config.getoption("--prefetch-models") or session.config.option.collectonly:
+        return
+    repo_ids = {
+        get_hub_repo_id(item.callspec.params["model_fixture"])
+        for item in session.items
+        if "model_fixture" in item.fixturenames
+    }
+    repo_ids.discard(None)
+    # downloads are network bound, so threads overlap them well
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(_prefetch_repo, sorted(repo_ids)))
+
+
+def _prefetch_repo(repo_id: str) -> None:
+    """Download a hub repository into the local cache, failures are left to the test that loads the model."""
+    try:
+        snapshot_download(repo_id, allow_patterns=["*.json", "*.txt", "*.model", "*.safetensors"])
+    except Exception as e:
+        warnings.warn(f"Could not prefetch {repo_id}: {e}", stacklevel=2)
@@ -0,0 +1,24 @@
+from typing import Any
+
+import pytest
+import torch
+
+from pruna import SmashConfig, smash
+
+
+@pytest.mark.cuda
+@pytest.mark.parametrize("model_fixture", ["ddpm-cifar10"], indirect=["model_fixture"])
+def test_generator_follows_the_model_device(model_fixture: tuple[Any, SmashConfig]) -> None:
+    """Test that the seeded generator is recreated on the device the pipeline is moved to after smashing."""
+    model, smash_config = model_fixture
+    smash_config["device"] = "cuda"
+    smashed_model = smash(model=model, smash_config=smash_config)
+    smashed_model.inference_handler.model_args["num_inference_steps"] = 2
+    batch = (torch.zeros(1), torch.zeros(1))
+
+    smashed_model.run_inference(batch, "cuda")
+    assert smashed_model.inference_handler.model_args["generator"].device.type == "cuda"
+
+    smashed_model.move_to_device("cpu")
+    smashed_model.run_inference(batch, "cpu")
+    assert smashed_model.inference_handler.model_args["generator"].device.type == "cpu"
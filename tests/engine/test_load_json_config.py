@@ -0,0 +1,35 @@
+import json
+import os
+from pathlib import Path
+
+import pytest
+
+from pruna.engine.utils import load_json_config
+
+
+def _write_config(path: Path, config: dict, mtime_ns: int) -> None:
+    """Write a JSON config and set its modification time."""
+    path.write_text(json.dumps(config))
+    os.utime(path, ns=(mtime_ns, mtime_ns))
+
+
+@pytest.mark.cpu
+def test_load_json_config_returns_copies(tmp_path: Path) -> None:
+    """Test that changes to a loaded config do not leak into the cached config."""
+    _write_config(tmp_path / "config.json", {"layers": [1, 2]}, mtime_ns=1_000_000_000)
+    config = load_json_config(str(tmp_path), "config.json")
+    config["layers"].append(3)
+    assert load_json_config(str(tmp_path), "config.json") == {"layers": [1, 2]}
+
+
+@pytest.mark.cpu
+def test_load_json_config_reloads_rewritten_file(tmp_path: Path) -> None:
+    """Test that a rewritten file is parsed again, also if it keeps the same size."""
+    _write_config(tmp_path / "config.json", {"value": 1}, mtime_ns=1_000_000_000)
+    assert load_json_config(str(tmp_path), "config.json") == {"value": 1}
+
+    _write_config(tmp_path / "config.json", {"value": 2}, mtime_ns=2_000_000_000)
+    assert load_json_config(str(tmp_path), "config.json") == {"value": 2}
+
+    _write_config(tmp_path / "config.json", {"value": 30}, mtime_ns=2_000_000_000)
+    assert load_json_config(str(tmp_path), "config.json") == {"value": 30}
@@ -0,0 +1,117 @@
+import gc
+import os
+from copy import copy
+from types import SimpleNamespace
+from typing import Any, Callable, Iterator
+
+import pytest
+import torch
+
+from pruna.evaluation.evaluation_agent import EvaluationAgent, _ReplayDataLoader
+
+
+class _CountingDataLoader:
+    """Dataloader that counts how often it is iterated."""
+
+    batch_size = 2
+
+    def __init__(self, batches: list[Any]) -> None:
+        self.batches = batches
+        self.iterations = 0
+
+    def __iter__(self) -> Iterator[Any]:
+        self.iterations += 1
+        return iter(self.batches)
+
+    def __len__(self) -> int:
+        return len(self.batches)
+
+
+@pytest.mark.cpu
+def test_replay_dataloader_loads_batches_once() -> None:
+    """Test that the batches are loaded once and replayed on later iterations."""
+    batches = [(torch.randn(2, 3), torch.randn(2)) for _ in range(3)]
+    dataloader = _CountingDataLoader(batches)
+    replay = _ReplayDataLoader(dataloader)
+
+    # an iteration that stops early only loads the batches it used
+    assert next(iter(replay)) is batches[0]
+    assert list(replay) == batches
+    assert list(replay) == batches
+    assert dataloader.iterations == 1
+    assert len(replay) == 3
+    assert replay.batch_size == 2
+
+
+@pytest.mark.cpu
+def test_replay_dataloader_does_not_forward_private_attributes() -> None:
+    """Test that private lookups are not forwarded, so the wrapper can be copied."""
+    replay = _ReplayDataLoader(_CountingDataLoader([]))
+    assert not hasattr(replay, "_private")
+    assert copy(replay).dataloader is replay.dataloader
+
+
+class _ScalingModel:
+    """Stand-in for a PrunaModel that scales the inputs of every batch."""
+
+    def __init__(self, scale: float) -> None:
+        self.scale = scale
+        self.inference_handler = SimpleNamespace(move_inputs_to_device=lambda batch, device: batch)
+
+    def move_to_device(self, device: str) -> None:
+        """Keep the model on the CPU."""
+
+    def run_inference(self, batch: Any, device: str) -> torch.Tensor:
+        """Scale the inputs of the batch."""
+        return batch[0] * self.scale
+
+
+class _RecordingMetric:
+    """Pairwise metric that records the arguments of its updates."""
+
+    def __init__(self) -> None:
+        self.updates: list[tuple[torch.Tensor, torch.Tensor]] = []
+
+    def get_update_fn(self) -> Callable[..., None]:
+        """Get the update function of the metric."""
+        return lambda x, cached_outputs, outputs: self.updates.append((cached_outputs, outputs))
+
+
+def _pairwise_task() -> SimpleNamespace:
+    """Build a pairwise CPU task with two batches."""
+    dataloader = [(torch.full((2, 3), float(i)), torch.zeros(2)) for i in range(1, 3)]
+    return SimpleNamespace(device="cpu", dataloader=dataloader, is_pairwise_evaluation=lambda: True)
+
+
+@pytest.mark.cpu
+def test_pairwise_cache_compares_against_first_model() -> None:
+    """Test that the outputs of the first model are cached on disk and replayed to the pairwise metrics."""
+    agent = EvaluationAgent(_pairwise_task())
+    metric = _RecordingMetric()
+
+    agent.update_stateful_metrics(_ScalingModel(1.0), [], [metric])
+    assert metric.updates == []
+    assert len(os.listdir(agent.cache_path)) == 2
+
+    agent.evaluation_for_first_model = False
+    agent.update_stateful_metrics(_ScalingModel(2.0), [], [metric])
+    assert len(metric.updates) == 2
+    for i, (cached_outputs, outputs) in enumerate(metric.updates, start=1):
+        assert torch.equal(cached_outputs, torch.full((2, 3), float(i)))
+        assert torch.equal(outputs, torch.full((2, 3), 2.0 * i))
+
+
+@pytest.mark.cpu
+def test_pairwise_cache_is_private_to_the_agent() -> None:
+    """Test that every agent starts from an empty cache, which is removed once the agent is gone."""
+    agent = EvaluationAgent(_pairwise_task())
+    agent.update_stateful_metrics(_ScalingModel(1.0), [], [_RecordingMetric()])
+    cache_path = agent.cache_path
+
+    other_agent = EvaluationAgent(_pairwise_task())
+    assert other_agent.cache_path != cache_path
+    assert os.listdir(other_agent.cache_path) == []
+
+    del agent
+    gc.collect()
+    assert not os.path.exists(cache_path)
@@ -61,3 +61,24 @@ def test_torch_metrics(dataloader_fixture: Any, metric: str) -> None:
     _, gt = next(iter(dataloader_fixture))
     metric.update(gt, gt, gt)
     assert metric.compute() == 1.0
+
+
+@pytest.mark.cpu
+def test_dense_metric_update_is_compiled_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the update of a dense pixel metric is compiled once and reused across batches."""
+    compiled_functions = []
+
+    def counting_compile(fn: Any, **kwargs: Any) -> Any:
+        compiled_functions.append(fn)
+        return fn
+
+    monkeypatch.setattr(torch, "compile", counting_compile)
+    metric = TorchMetricWrapper("psnr", data_range=1.0)
+    images = torch.rand(2, 3, 8, 8)
+
+    update_fn = metric.get_update_fn()
+    for _ in range(3):
+        update_fn(images, images * 0.5, images)
+    assert metric.get_update_fn() is update_fn
+    assert len(compiled_functions) == 1
+    assert metric.compute() > 0.0
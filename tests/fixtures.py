@@ -1,5 +1,6 @@
 import weakref
-from functools import partial
+from copy import copy, deepcopy
+from functools import lru_cache, partial
 from typing import Any, Callable
 
 import pytest
@@ -26,14 +27,32 @@ HIGH_RESOURCE_FIXTURES_CPU = HIGH_RESOURCE_FIXTURES + [
 ]
 
 
+@pytest.fixture(scope="session")
+def model_registry() -> Any:
+    """Session-wide cache of freshly loaded models and their smash configs, tests only receive copies of them."""
+    load_model = lru_cache(maxsize=3)(lambda model_name: MODEL_FACTORY[model_name]())
+    yield load_model
+    load_model.cache_clear()
+
+
 @pytest.fixture(scope="function")
-def model_fixture(request: pytest.FixtureRequest) -> Any:
+def model_fixture(request: pytest.FixtureRequest, model_registry: Any) -> Any:
     """Model fixture for testing."""
     no_weakref = request.param.startswith("noref_")
     if no_weakref:
         request.param = request.param.removeprefix("noref_")
 
-    model, smash_config = MODEL_FACTORY[request.param]()
+    if request.param in HIGH_RESOURCE_FIXTURES_CPU:
+        # large models are not kept in memory next to the copy under test
+        model, smash_config = MODEL_FACTORY[request.param]()
+    else:
+        # smashing modifies the model in place, so every test gets its own copy of the cached model,
+        # the tokenizer, processor and data are copied together so the collate functions keep pointing to the copies
+        cached_model, cached_smash_config = model_registry(request.param)
+        model, smash_config = deepcopy(cached_model), copy(cached_smash_config)
+        smash_config.tokenizer, smash_config.processor, smash_config._data = deepcopy(
+            (cached_smash_config.tokenizer, cached_smash_config.processor, cached_smash_config._data)
+        )
 
     if no_weakref:
         yield model, smash_config
@@ -141,3 +160,10 @@ MODEL_FACTORY: dict[str, Callable] = {
     "ddpm-cifar10": partial(get_diffusers_model, DDIMPipeline, "google/ddpm-cifar10-32"),
     "dummy_lambda": dummy_model,
 }
+
+
+def get_hub_repo_id(model_name: str) -> str | None:
+    """Get the Hugging Face Hub repository a model fixture is loaded from, if it is a plain hub model."""
+    factory = MODEL_FACTORY.get(model_name.removeprefix("noref_"))
+    args = factory.args if isinstance(factory, partial) else ()
+    return next((arg for arg in args if isinstance(arg, str) and "/" in arg), None)